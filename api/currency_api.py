@@ -1,14 +1,59 @@
 # currency_api.py
 
+import os
+import threading
+import time
+from datetime import date
+import numpy as np
 import requests
 from api.api_key import EXCHANGE_API_KEY
-from core.database import get_setting
+from core.models import to_epoch_day
+from core.rate_history import record_quotes
+from core.settings import get_setting
+from core.tracing import traced
+from core.database import (
+    get_stored_rate,
+    store_rate,
+    store_rates,
+    get_stored_rates_for_quote,
+)
+
+CURRENCY_LIST = ["USD", "MMK", "EUR", "JPY", "SGD", "THB", "CNY"]
 
 # -------------------------------
-# In-memory live rate storage
+# Rate storage
 # -------------------------------
-LATEST_RATES = {}     # { ("USD", "MMK"): 2100.54 }
-CURRENCY_LIST = ["USD", "MMK", "EUR", "JPY", "SGD", "THB", "CNY"]
+# All CURRENCY_LIST cross rates come from ONE /live request priced against
+# PIVOT_CURRENCY. The pivot column is stored in the exchange_rates table
+# (survives restarts, shared by workers) and expanded into an N x N matrix:
+#   RATE_MATRIX[i, j] = value of 1 CURRENCY_LIST[j] in CURRENCY_LIST[i]
+PIVOT_CURRENCY = "USD"
+CURRENCY_INDEX = {c: i for i, c in enumerate(CURRENCY_LIST)}
+RATE_MATRIX = None          # np.ndarray, NaN where the API had no quote
+RATES_FETCHED_AT = 0.0      # epoch seconds of the matrix's pivot quotes
+RATES_VERSION = 0           # bumped whenever any rate in memory changes
+
+# Pairs outside CURRENCY_LIST still go through /convert, one at a time.
+LATEST_RATES = {}     # { ("USD", "XAU"): (1900.0, fetched_at_epoch) }
+
+# A stored rate older than this is still served, but refreshed in the
+# background (stale-while-revalidate).
+RATE_TTL_SECONDS = int(os.environ.get("MONEYTRACKER_RATE_TTL", 6 * 60 * 60))
+
+# Background refresher: re-fetch once a rate is REFRESH_AHEAD of the way
+# to expiry, so readers never see it go stale while the API is healthy.
+REFRESH_AHEAD = 0.8
+REFRESHER_POLL_SECONDS = 30
+RETRY_AFTER_SECONDS = 60    # back-off after a failed fetch
+
+# Read-only processes (core.precompute workers) turn this off: stale rates
+# are then served as they are instead of starting a fetch-and-store thread.
+BACKGROUND_REFRESH = True
+
+_refreshing = set()   # refresh jobs in flight ("matrix" or (base, quote))
+_refreshing_lock = threading.Lock()
+_failed_at = {}       # job -> epoch of its last failed refresh
+_refresher_thread = None
 
 # Placeholder fallback if API fails
 PLACEHOLDER_RATE = 2000.0
@@ -54,34 +99,237 @@ def fetch_rate_from_api(base: str, quote: str):
 
 
 # ---------------------------------------------------------
-# Unified rate loader (LIVE + in-memory storage)
+# Fetch every CURRENCY_LIST rate using one /live call
 # ---------------------------------------------------------
-def get_rate(base: str, quote: str) -> float:
+def fetch_pivot_rates_from_api(pivot: str, currencies):
     """
-    Return how much *1 unit of QUOTE* is worth in BASE.
-    Example:
-        get_rate("USD", "MMK") => 0.00048 (MMK → USD)
-        get_rate("MMK", "USD") => 2100.5 (USD → MMK)
+    Fetch live quotes for all `currencies` against `pivot` in one request.
+    Returns {currency: units of currency per 1 PIVOT}, or None on failure.
     """
+    symbols = ",".join(c for c in currencies if c != pivot)
+    url = (
+        f"https://api.exchangerate.host/live"
+        f"?source={pivot}&currencies={symbols}"
+    )
+    if EXCHANGE_API_KEY:
+        url += f"&access_key={EXCHANGE_API_KEY}"
 
-    # same currency
-    if base == quote:
-        return 1.0
+    try:
+        response = requests.get(url, timeout=5)
+        data = response.json()
+
+        if data.get("success") and "quotes" in data:
+            quotes = {pivot: 1.0}
+            for pair, value in data["quotes"].items():
+                # keys look like "USDEUR"
+                if pair.startswith(pivot) and value:
+                    quotes[pair[len(pivot):]] = float(value)
+            return quotes
+
+    except Exception:
+        pass
+
+    return None
+
+
+def build_rate_matrix(pivot_quotes, currencies) -> np.ndarray:
+    """
+    Triangulate an N x N cross-rate matrix through the pivot:
+    1 j = (1 / u[j]) PIVOT = (u[i] / u[j]) i,  u[c] = c per 1 PIVOT.
+    """
+    u = np.array([pivot_quotes.get(c, np.nan) for c in currencies], dtype=np.float64)
+    matrix = np.outer(u, 1.0 / u)
+    np.fill_diagonal(matrix, 1.0)
+    return matrix
+
+
+def rate_version() -> int:
+    """Changes whenever rates are refreshed; usable as part of a cache key."""
+    return RATES_VERSION
+
+
+def _bump_rate_version():
+    global RATES_VERSION
+    RATES_VERSION += 1
+
+
+def _set_matrix(pivot_quotes, fetched_at: float):
+    global RATE_MATRIX, RATES_FETCHED_AT
+    RATE_MATRIX = build_rate_matrix(pivot_quotes, CURRENCY_LIST)
+    RATES_FETCHED_AT = fetched_at
+    _bump_rate_version()
+
+
+def _load_stored_matrix() -> bool:
+    """Rebuild RATE_MATRIX from the stored pivot column if it is newer."""
+    rows = get_stored_rates_for_quote(PIVOT_CURRENCY)
+    quotes = {r["base"]: r["rate"] for r in rows if r["base"] in CURRENCY_INDEX}
+
+    if len(quotes) < len(CURRENCY_LIST) - 1:
+        return False
+
+    fetched_at = min(r["fetched_at"] for r in rows if r["base"] in quotes)
+    if RATE_MATRIX is None or fetched_at > RATES_FETCHED_AT:
+        quotes[PIVOT_CURRENCY] = 1.0
+        _set_matrix(quotes, fetched_at)
+
+    return True
+
+
+@traced("rates")
+def refresh_rate_matrix() -> bool:
+    """One HTTP round trip refreshes every CURRENCY_LIST pair."""
+    quotes = fetch_pivot_rates_from_api(PIVOT_CURRENCY, CURRENCY_LIST)
+    if quotes is None:
+        return False
+
+    fetched_at = time.time()
+    # stored as (base=c, quote=PIVOT, rate=c per 1 PIVOT)
+    store_rates([
+        (c, PIVOT_CURRENCY, rate, fetched_at)
+        for c, rate in quotes.items() if c != PIVOT_CURRENCY
+    ])
+    # ...and kept as today's point in the dated history (core/rate_history.py)
+    record_quotes(quotes, to_epoch_day(date.today()))
+    _set_matrix(quotes, fetched_at)
+    return True
+
+
+def ensure_rate_matrix(fetch: bool = True) -> bool:
+    """
+    For batch jobs, not page renders: load the stored matrix and, if it is
+    missing or stale and `fetch` is set, refresh it now (blocking).
+    Returns whether a fresh matrix is in memory.
+    """
+    if not _load_stored_matrix() or _is_stale(RATES_FETCHED_AT):
+        if not (fetch and refresh_rate_matrix()):
+            return RATE_MATRIX is not None and not _is_stale(RATES_FETCHED_AT)
+    return True
+
+
+def rates_fetched_at() -> float:
+    """Epoch seconds of the in-memory matrix's quotes (0.0 before any)."""
+    return RATES_FETCHED_AT
+
+
+def _matrix_entry(i: int, j: int):
+    """O(1) lookup -> (rate, fetched_at), or None if unavailable. Never blocks."""
+    if RATE_MATRIX is None or _is_stale(RATES_FETCHED_AT):
+        # Another worker may have refreshed the shared table in the meantime
+        _load_stored_matrix()
+
+    if RATE_MATRIX is None or _is_stale(RATES_FETCHED_AT):
+        _revalidate_in_background("matrix", refresh_rate_matrix)
+
+    if RATE_MATRIX is None or np.isnan(RATE_MATRIX[i, j]):
+        return None
+
+    return float(RATE_MATRIX[i, j]), RATES_FETCHED_AT
 
+
+# ---------------------------------------------------------
+# Local store: memory first, then SQLite
+# ---------------------------------------------------------
+def _is_stale(fetched_at: float) -> bool:
+    return time.time() - fetched_at > RATE_TTL_SECONDS
+
+
+def _remember(base: str, quote: str, rate: float):
+    fetched_at = time.time()
+    LATEST_RATES[(base, quote)] = (rate, fetched_at)
+    store_rate(base, quote, rate, fetched_at)
+    _bump_rate_version()
+
+
+def _load_stored(base: str, quote: str):
+    """Return (rate, fetched_at) from memory or the database, or None."""
     key = (base, quote)
+    entry = LATEST_RATES.get(key)
 
-    # Return stored rate if we already fetched it
-    if key in LATEST_RATES:
-        return LATEST_RATES[key]
+    # Another worker may have refreshed the shared table in the meantime
+    if entry is None or _is_stale(entry[1]):
+        row = get_stored_rate(base, quote)
+        if row is not None and (entry is None or row["fetched_at"] > entry[1]):
+            entry = (row["rate"], row["fetched_at"])
+            LATEST_RATES[key] = entry
+            _bump_rate_version()
 
-    # Fetch live rate
+    return entry
+
+
+def _refresh_pair(base: str, quote: str) -> bool:
     live_rate = fetch_rate_from_api(base, quote)
+    if live_rate is None:
+        return False
+
+    _remember(base, quote, live_rate)
+    return True
+
+
+# ---------------------------------------------------------
+# Background refresh (page renders never wait on HTTP)
+# ---------------------------------------------------------
+def _run_refresh(job, target, args):
+    try:
+        ok = target(*args)
+    except Exception:
+        ok = False
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(job)
+
+    if not ok:
+        _failed_at[job] = time.time()
+
+
+def _revalidate_in_background(job, target, *args):
+    """Start at most one background refresh per job key, with back-off."""
+    if not BACKGROUND_REFRESH:
+        return
+    if time.time() - _failed_at.get(job, 0.0) < RETRY_AFTER_SECONDS:
+        return
+
+    with _refreshing_lock:
+        if job in _refreshing:
+            return
+        _refreshing.add(job)
+
+    threading.Thread(target=_run_refresh, args=(job, target, args), daemon=True).start()
+
+
+def _refresher_loop():
+    while True:
+        if RATE_MATRIX is None or time.time() - RATES_FETCHED_AT > RATE_TTL_SECONDS * REFRESH_AHEAD:
+            # Prefer a matrix another worker already stored over a new fetch
+            _load_stored_matrix()
+
+        if RATE_MATRIX is None or time.time() - RATES_FETCHED_AT > RATE_TTL_SECONDS * REFRESH_AHEAD:
+            _revalidate_in_background("matrix", refresh_rate_matrix)
+
+        time.sleep(REFRESHER_POLL_SECONDS)
+
+
+def start_rate_refresher():
+    """
+    Start the process-wide background refresher (idempotent; safe to call
+    on every Streamlit rerun). It keeps every CURRENCY_LIST pair fetched
+    ahead of expiry so get_rate() only ever reads memory.
+    """
+    global _refresher_thread
+
+    with _refreshing_lock:
+        if _refresher_thread is not None and _refresher_thread.is_alive():
+            return
+        _refresher_thread = threading.Thread(
+            target=_refresher_loop, name="rate-refresher", daemon=True
+        )
+        _refresher_thread.start()
 
-    if live_rate is not None:
-        LATEST_RATES[key] = live_rate
-        return live_rate
 
-    # Fallback
+# ---------------------------------------------------------
+# Unified rate loader (local store only; never blocks)
+# ---------------------------------------------------------
+def _fallback_rate(base: str, quote: str) -> float:
     if base == "USD" and quote == "MMK":
         return 1 / PLACEHOLDER_RATE
 
@@ -91,15 +339,73 @@ def get_rate(base: str, quote: str) -> float:
     return 1.0   # generic fallback
 
 
+@traced("rates")
+def get_rate_info(base: str, quote: str) -> dict:
+    """
+    Like get_rate() but also reports freshness:
+    {"rate": 0.00048, "fetched_at": 1700000000.0 or None,
+     "age_seconds": 42.0 or None, "stale": False}
+    fetched_at is None when no rate has been fetched yet and a placeholder
+    is being used; that is always reported as stale.
+    """
+
+    # same currency
+    if base == quote:
+        return {"rate": 1.0, "fetched_at": None, "age_seconds": None, "stale": False}
+
+    entry = None
+    if base in CURRENCY_INDEX and quote in CURRENCY_INDEX:
+        entry = _matrix_entry(CURRENCY_INDEX[base], CURRENCY_INDEX[quote])
+
+    if entry is None:
+        entry = _load_stored(base, quote)
+        if entry is None or _is_stale(entry[1]):
+            _revalidate_in_background((base, quote), _refresh_pair, base, quote)
+
+    if entry is None:
+        return {
+            "rate": _fallback_rate(base, quote),
+            "fetched_at": None,
+            "age_seconds": None,
+            "stale": True,
+        }
+
+    rate, fetched_at = entry
+    return {
+        "rate": rate,
+        "fetched_at": fetched_at,
+        "age_seconds": max(0.0, time.time() - fetched_at),
+        "stale": _is_stale(fetched_at),
+    }
+
+
+def get_rate(base: str, quote: str) -> float:
+    """
+    Return how much *1 unit of QUOTE* is worth in BASE.
+    Example:
+        get_rate("USD", "MMK") => 0.00048 (MMK → USD)
+        get_rate("MMK", "USD") => 2100.5 (USD → MMK)
+
+    Never waits on the network: CURRENCY_LIST pairs are an array lookup
+    in RATE_MATRIX, kept fresh by start_rate_refresher(). A missing or
+    stale rate is refreshed in the background and the last known rate
+    (or a placeholder) is returned meanwhile; see get_rate_info().
+    """
+    return get_rate_info(base, quote)["rate"]
+
+
 # ---------------------------------------------------------
 # Convert any currency → base currency
 # ---------------------------------------------------------
-def convert_to_base(amount: float, from_currency: str) -> float:
+def convert_to_base(amount: float, from_currency: str, base: str = None) -> float:
     """
-    Convert an amount FROM any currency TO the current base currency.
+    Convert an amount FROM any currency TO the base currency.
+    `base` defaults to the global base_currency setting (served from the
+    in-memory settings cache, not SQLite).
     """
 
-    base = get_setting("base_currency")
+    if base is None:
+        base = get_setting("base_currency")
 
     if from_currency == base:
         return amount
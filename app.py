@@ -1,10 +1,13 @@
 import streamlit as st
 
-from api.currency_api import convert_to_base, get_currency_list
-from core.database import init_db, init_settings, get_setting
+from api.currency_api import get_currency_list, start_rate_refresher
+from core.database import init_db, init_settings
+from core.settings import get_user_setting
+from core.sessions import validate_session, revoke_session
+from core.tracing import start_trace, finish_trace
 
 # Import page modules
-from tabs import authUI, dashboard, transactions, settings
+from tabs import authUI, dashboard, transactions, settings, devpanel
 
 # ---------------------------------------------
 # Initialization
@@ -13,9 +16,11 @@ st.set_page_config(page_title="Money Tracker", layout="wide")
 
 init_db()
 init_settings()
+start_rate_refresher()   # once per process; later reruns are no-ops
 
 CURRENCIES = get_currency_list()
-base_currency = get_setting("base_currency")
+
+finish_trace()   # drop a trace left open by an interrupted rerun
 
 
 # -----------------------------------------------------
@@ -26,6 +31,24 @@ if "user" not in st.session_state:
 if "auth_mode" not in st.session_state:
     st.session_state["auth_mode"] = "login"  # or 'register'
 
+# A revoked or expired session (logout elsewhere, password change) ends
+# this browser session too
+if st.session_state["user"] and not validate_session(st.session_state.get("session_token")):
+    st.session_state["user"] = None
+    st.session_state.pop("session_token", None)
+    st.query_params.pop("session", None)
+
+# A reload loses session_state; restore the login from the signed token
+# kept in the URL (?session=...) before falling back to the login form.
+if not st.session_state["user"] and "session" in st.query_params:
+    token = st.query_params["session"]
+    user = validate_session(token)
+    if user:
+        st.session_state["user"] = user
+        st.session_state["session_token"] = token
+    else:
+        del st.query_params["session"]   # expired or revoked
+
 # If not logged in, show login/register form and stop further rendering
 if not st.session_state["user"]:
     authUI.render()
@@ -36,6 +59,15 @@ if not st.session_state["user"]:
 # -----------------------------------------------------
 current_user = st.session_state["user"]
 
+# Opt-in tracing (MONEYTRACKER_DEV=1): record this rerun, show the previous one.
+# A rerun cut short by st.stop()/st.rerun() simply leaves no summary.
+dev_mode = devpanel.is_enabled()
+if dev_mode:
+    devpanel.render(st.session_state.get("dev_last_trace"))
+    start_trace("rerun")
+
+base_currency = get_user_setting(current_user["id"], "base_currency")
+
 # Top-right logout button (keeps title centered)
 cols = st.columns([6, 3, 1])
 
@@ -47,6 +79,8 @@ with cols[1]:
 
 with cols[2]:
     if st.button("Logout"):
+        revoke_session(st.session_state.pop("session_token", None))
+        st.query_params.pop("session", None)
         st.session_state["user"] = None
         st.rerun()
 
@@ -57,10 +91,13 @@ with cols[2]:
 tab1, tab2, tab3 = st.tabs(["Dashboard", "Transactions", "Settings"])
 
 with tab1:
-    dashboard.render(convert_to_base, base_currency, current_user)
+    dashboard.render(base_currency, current_user)
 
 with tab2:
     transactions.render(CURRENCIES, current_user)
 
 with tab3:
-    settings.render(base_currency, CURRENCIES)
+    settings.render(base_currency, CURRENCIES, current_user)
+
+if dev_mode:
+    devpanel.record(finish_trace().summary())
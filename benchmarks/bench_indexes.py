@@ -0,0 +1,77 @@
+# bench_indexes.py
+#
+# Full-table scan vs. (user_id, ...) index lookup on the transactions table.
+#
+#   python -m benchmarks.bench_indexes --rows 1000000 --users 1000
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.datagen import open_bench_db, populate
+
+QUERIES = {
+    "all rows for user":
+        "SELECT * FROM transactions {hint} WHERE user_id = ? ORDER BY id;",
+    "user + date range":
+        "SELECT * FROM transactions {hint} "
+        "WHERE user_id = ? AND day BETWEEN 19723 AND 19813;",   # 2024-01-01 .. 2024-03-31
+    "user + category":
+        "SELECT SUM(amount_minor) FROM transactions {hint} "
+        "WHERE user_id = ? AND category = 'Food';",
+}
+
+
+def build_database(path: str, rows: int, users: int, seed: int = 7):
+    conn = open_bench_db(path)
+    populate(conn, users, rows, seed=seed, skew=0.0)   # uniform users
+    return conn
+
+
+def time_query(conn, sql: str, user_ids, repeat: int) -> float:
+    """Median milliseconds per query over `repeat` different users."""
+    samples = []
+    for uid in user_ids[:repeat]:
+        t0 = time.perf_counter()
+        conn.execute(sql, (uid,)).fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan vs. index lookup on transactions")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+
+        t0 = time.perf_counter()
+        conn = build_database(path, args.rows, args.users)
+        print(f"built {args.rows:,} rows / {args.users:,} users "
+              f"in {time.perf_counter() - t0:.1f}s\n")
+
+        user_ids = list(range(1, args.users + 1))
+        random.Random(1).shuffle(user_ids)
+
+        print(f"{'query':<20} {'scan ms':>10} {'index ms':>10} {'speed-up':>9}")
+        for name, template in QUERIES.items():
+            scan = time_query(conn, template.format(hint="NOT INDEXED"), user_ids, args.repeat)
+            indexed = time_query(conn, template.format(hint=""), user_ids, args.repeat)
+            print(f"{name:<20} {scan:>10.2f} {indexed:>10.2f} {scan / indexed:>8.1f}x")
+
+        print("\nquery plans:")
+        for name, template in QUERIES.items():
+            plan = conn.execute("EXPLAIN QUERY PLAN " + template.format(hint=""), (1,)).fetchall()
+            print(f"  {name}: " + "; ".join(row["detail"] for row in plan))
+
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# compare.py
+#
+# Compare two benchmark result files written by benchmarks/run.py.
+#
+#   python -m benchmarks.compare base.json new.json --threshold 1.2
+#
+# Exits with status 1 if any benchmark's median got slower than threshold.
+
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="new/old median ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    old = load(args.baseline)["results"]
+    new = load(args.candidate)["results"]
+
+    regressions = 0
+    print(f"{'benchmark':<48} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+
+    for name in sorted(old.keys() | new.keys()):
+        if name not in old or name not in new:
+            side = "baseline" if name in old else "candidate"
+            print(f"{name:<48} {'only in ' + side:>29}")
+            continue
+
+        before, after = old[name]["median_ms"], new[name]["median_ms"]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            flag = "  faster"
+
+        print(f"{name:<48} {before:>10.3f} {after:>10.3f} {ratio:>6.2f}x{flag}")
+
+    print(f"\n{regressions} regression(s) above {args.threshold:.2f}x")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
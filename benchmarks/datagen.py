@@ -0,0 +1,119 @@
+# datagen.py
+#
+# Deterministic synthetic data for benchmarks: users x transactions with
+# skewed (Zipf-like) user activity, currency mix and category mix.
+#
+#   python -m benchmarks.datagen bench.db --users 1000 --transactions 10000000
+
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+
+from core.migrations import run_migrations
+
+CURRENCIES = ["USD", "MMK", "EUR", "JPY", "SGD", "THB", "CNY"]
+CATEGORIES = [
+    "Food", "Rent", "Salary", "Transport", "Utilities", "Groceries", "Fun",
+    "Travel", "Health", "Insurance", "Gifts", "Education", "Phone", "Internet",
+    "Clothes", "Coffee", "Books", "Sports", "Pets", "Charity", "Taxes",
+    "Bonus", "Freelance", "Interest", "Dividends", "Repairs", "Garden",
+    "Games", "Music", "Streaming", "Parking", "Fuel", "Haircut", "Laundry",
+    "Furniture", "Electronics", "Software", "Hobbies", "Kids", "Misc",
+]
+INCOME_SHARE = 0.3
+START_DAY = int(np.datetime64("2018-01-01", "D").astype(np.int64))   # epoch day
+DAYS = 365 * 8
+CHUNK_SIZE = 100_000
+
+
+def zipf_weights(n: int, skew: float) -> np.ndarray:
+    """Probabilities proportional to 1 / rank**skew (skew=0 -> uniform)."""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def create_users(conn: sqlite3.Connection, users: int):
+    with conn:
+        conn.executemany("""
+            INSERT OR IGNORE INTO users (id, username, password_hash, salt, created_at)
+            VALUES (?, ?, '', '', '2018-01-01T00:00:00');
+        """, ((u, f"user{u}") for u in range(1, users + 1)))
+
+
+def generate_chunks(users: int, transactions: int, seed: int = 42, skew: float = 1.1,
+                    chunk_size: int = CHUNK_SIZE):
+    """
+    Yield lists of (t_type, amount_minor, currency, category, day, user_id) rows.
+    The same (users, transactions, seed, skew) always gives the same rows.
+    """
+    rng = np.random.default_rng(seed)
+    user_p = zipf_weights(users, skew)
+    currency_p = zipf_weights(len(CURRENCIES), skew)
+    category_p = zipf_weights(len(CATEGORIES), skew)
+    currencies = np.array(CURRENCIES, dtype=object)
+    categories = np.array(CATEGORIES, dtype=object)
+
+    remaining = transactions
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        remaining -= n
+
+        t_types = np.where(rng.random(n) < INCOME_SHARE, "Income", "Expense")
+        amounts = np.rint(rng.lognormal(mean=3.5, sigma=1.2, size=n) * 100).astype(np.int64) + 1
+        cur = currencies[rng.choice(len(CURRENCIES), size=n, p=currency_p)]
+        cat = categories[rng.choice(len(CATEGORIES), size=n, p=category_p)]
+        days = START_DAY + rng.integers(0, DAYS, size=n)
+        user_ids = rng.choice(users, size=n, p=user_p) + 1
+
+        yield list(zip(
+            t_types.tolist(), amounts.tolist(), cur.tolist(),
+            cat.tolist(), days.tolist(), user_ids.tolist(),
+        ))
+
+
+def populate(conn: sqlite3.Connection, users: int, transactions: int,
+             seed: int = 42, skew: float = 1.1, chunk_size: int = CHUNK_SIZE):
+    """Migrate the schema, create users and insert the synthetic rows."""
+    run_migrations(conn)
+    create_users(conn, users)
+
+    for rows in generate_chunks(users, transactions, seed, skew, chunk_size):
+        with conn:
+            conn.executemany("""
+                INSERT INTO transactions (t_type, amount_minor, currency, category, day, user_id)
+                VALUES (?, ?, ?, ?, ?, ?);
+            """, rows)
+
+    conn.execute("ANALYZE;")
+
+
+def open_bench_db(path: str) -> sqlite3.Connection:
+    """Connection tuned for fast loading (durability is irrelevant here)."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = OFF;")
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark database")
+    parser.add_argument("db_path")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skew", type=float, default=1.1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    conn = open_bench_db(args.db_path)
+    populate(conn, args.users, args.transactions, args.seed, args.skew)
+    conn.close()
+    print(f"Generated {args.transactions:,} transactions for {args.users:,} users "
+          f"in {time.perf_counter() - started:.1f}s -> {args.db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# run.py
+#
+# Benchmark suite: analytics, DB helpers, currency conversion and login
+# hashing against a synthetic database, with the exchange-rate HTTP API
+# replaced by a local stub. Results are written as JSON for comparison
+# (see benchmarks/compare.py).
+#
+#   python -m benchmarks.run --users 1000 --transactions 1000000 --out base.json
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from functools import partial
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from benchmarks.datagen import CURRENCIES, open_bench_db, populate
+
+# Fixed quotes served by the stub: units of currency per 1 USD
+STUB_QUOTES = {
+    "USD": 1.0, "MMK": 2100.0, "EUR": 0.92, "JPY": 151.3,
+    "SGD": 1.34, "THB": 35.9, "CNY": 7.21,
+}
+
+
+# --------------------------------------------------
+# Local stand-in for the exchangerate.host API
+# --------------------------------------------------
+class _StubResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def _stub_get(url, timeout=None):
+    parsed = urlparse(url)
+    query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+    if parsed.path.endswith("/live"):
+        source = query["source"]
+        per_source = STUB_QUOTES[source]
+        return _StubResponse({
+            "success": True,
+            "source": source,
+            "quotes": {
+                f"{source}{c}": STUB_QUOTES[c] / per_source
+                for c in query["currencies"].split(",") if c in STUB_QUOTES
+            },
+        })
+
+    if parsed.path.endswith("/convert"):
+        rate = STUB_QUOTES[query["to"]] / STUB_QUOTES[query["from"]]
+        return _StubResponse({"success": True, "result": rate * float(query.get("amount", 1))})
+
+    return _StubResponse({"success": False})
+
+
+# --------------------------------------------------
+# Timing
+# --------------------------------------------------
+def measure(fn, repeat: int, warmup: int = 1, ops: int = 1) -> dict:
+    """Run fn warmup+repeat times; `ops` = operations performed per call."""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        "median_ms": round(median, 4),
+        "min_ms": round(samples[0], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "runs": repeat,
+        "ops_per_sec": round(ops / (median / 1000), 1) if median > 0 else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+# --------------------------------------------------
+# Suite
+# --------------------------------------------------
+def run_suite(db_path: str, users: int, repeat: int) -> dict:
+    # Point the app at the benchmark DB and stub out HTTP before importing
+    # anything that might fetch rates.
+    import core.database as database
+    database.close_connections()
+    database.DB_NAME = db_path
+    database.init_db()
+    database.init_settings()
+
+    import api.currency_api as currency_api
+    currency_api.requests = SimpleNamespace(get=_stub_get)
+
+    from core import analytics, auth, columnar, forecast, precompute, search, settings
+
+    currency_api.refresh_rate_matrix()
+    base = settings.get_setting("base_currency")
+    convert = partial(currency_api.convert_to_base, base=base)
+    rate_for = partial(currency_api.get_rate, base)
+
+    # user 1 carries the most rows (Zipf); the middle user is typical
+    power_user, typical_user = 1, max(1, users // 2)
+    power_rows = len(database.get_transactions_for_user(power_user))
+    some_id = database.get_transactions_page(power_user, limit=1)[0]["id"]
+    mid_page = database.get_transactions_page(power_user, limit=power_rows // 2 or 1)
+    mid_cursor = database.page_cursor(mid_page[-1]) if mid_page else None
+
+    from core.models import Transaction
+    sample_tx = Transaction.create("Expense", 12.5, "EUR", "Food", "2024-05-01")
+
+    results = {}
+
+    def bench(name, fn, ops=1, n=repeat):
+        results[name] = measure(fn, n, ops=ops)
+        print(f"{name:<48} {results[name]['median_ms']:>10.3f} ms")
+
+    # ---------------- analytics ----------------
+    for label, uid in (("power", power_user), ("typical", typical_user)):
+        bench(f"analytics.compute_totals[{label}]", lambda: analytics.compute_totals(convert, uid))
+        bench(f"analytics.monthly_summary[{label}]", lambda: analytics.monthly_summary(convert, uid))
+        bench(f"analytics.category_breakdown[{label}]", lambda: analytics.category_breakdown(convert, uid))
+        bench(f"analytics.forecast_next_month[{label}]", lambda: analytics.forecast_next_month(convert, uid))
+        bench(f"forecast.forecast_for_user[{label}]", lambda: forecast.forecast_for_user(uid, rate_for, base))
+        bench(f"analytics.snapshot_aggregates[{label}]",
+              lambda: analytics.build_dashboard_snapshot(uid, convert, rate_for=rate_for, base=base))
+        bench(f"analytics.snapshot_columnar[{label}]",
+              lambda: analytics.build_dashboard_snapshot(uid, convert, rate_for=rate_for, base=base,
+                                                         source="rows"))
+
+    bench("forecast.rebuild[all users]", forecast.rebuild, n=max(1, repeat // 4))
+
+    # per-user cost; compare the two to see how the job scales with cores
+    cores = os.cpu_count() or 1
+    bench("precompute.precompute_all[1 worker]",
+          lambda: precompute.precompute_all(workers=1), ops=users, n=1)
+    bench(f"precompute.precompute_all[{cores} workers]",
+          lambda: precompute.precompute_all(workers=cores), ops=users, n=1)
+
+    # mid-month to mid-month: whole months from the aggregates, edges row by row
+    quarter = (date(2024, 1, 15), date(2024, 4, 14))
+    bench("analytics.snapshot_aggregates[power, range]",
+          lambda: analytics.build_dashboard_snapshot(power_user, convert, rate_for=rate_for, base=base,
+                                                     start=quarter[0], end=quarter[1]))
+    bench("analytics.snapshot_columnar[power, range]",
+          lambda: analytics.build_dashboard_snapshot(power_user, convert, rate_for=rate_for, base=base,
+                                                     source="rows", start=quarter[0], end=quarter[1]))
+    bench("db.get_transactions_for_user_in_range[power]",
+          lambda: database.get_transactions_for_user_in_range(power_user, *quarter))
+
+    # ---------------- database helpers ----------------
+    bench("db.get_transactions_for_user[power]", lambda: database.get_transactions_for_user(power_user))
+    bench("db.get_transactions_page[first]", lambda: database.get_transactions_page(power_user, 50))
+    bench("db.get_transactions_page[middle]",
+          lambda: database.get_transactions_page(power_user, 50, after=mid_cursor))
+    bench("db.get_transaction_by_id", lambda: database.get_transaction_by_id(some_id, power_user), n=repeat * 20)
+    bench("db.count_transactions_for_user", lambda: database.count_transactions_for_user(power_user))
+    bench("db.get_setting[sqlite]", lambda: database.get_setting("base_currency"), n=repeat * 20)
+    bench("settings.get_setting[cached]", lambda: settings.get_setting("base_currency"), n=repeat * 20)
+
+    def add_then_delete():
+        row_id = database.add_transaction(sample_tx, typical_user)
+        database.delete_transaction_for_user(row_id, typical_user)
+
+    bench("db.add_and_delete_transaction", add_then_delete, n=repeat * 4)
+    bench("db.update_transaction_for_user",
+          lambda: database.update_transaction_for_user(some_id, sample_tx, power_user), n=repeat * 4)
+
+    # shift by 0 days: a full batched write that leaves the data as it was
+    bulk_ids = [r["id"] for r in database.get_transactions_page(power_user, limit=1000)]
+    bench("db.update_transactions_bulk[1k rows]",
+          lambda: database.update_transactions_bulk(power_user, bulk_ids, shift_days=0),
+          ops=max(len(bulk_ids), 1))
+
+    # ---------------- search ----------------
+    # one keystroke of autocomplete, and a one-word search over the power user
+    bench("search.suggest_categories[prefix]",
+          lambda: search.suggest_categories(power_user, "gr"), n=repeat * 20)
+    bench("search.suggest_categories[top]",
+          lambda: search.suggest_categories(power_user), n=repeat * 20)
+    bench("search.search_transactions[power]",
+          lambda: search.search_transactions(power_user, "groc"), n=repeat * 4)
+    bench("search.search_transactions[no match]",
+          lambda: search.search_transactions(power_user, "zzzz"), n=repeat * 4)
+
+    # ---------------- conversion ----------------
+    n_calls = 100_000
+    amounts = [float(a) for a in range(1, n_calls + 1)]
+    currencies = [CURRENCIES[i % len(CURRENCIES)] for i in range(n_calls)]
+
+    def scalar_conversions():
+        for a, c in zip(amounts, currencies):
+            convert(a, c)
+
+    bench("convert.convert_to_base[100k calls]", scalar_conversions, ops=n_calls)
+
+    cols = columnar.load_user_columns(power_user)
+    bench(f"convert.columnar[{len(cols)} rows]",
+          lambda: columnar.convert_columns(cols, rate_for, base), ops=max(len(cols), 1))
+    bench("rates.get_rate", lambda: currency_api.get_rate("EUR", "JPY"), n=repeat * 20)
+    bench("rates.refresh_rate_matrix[stub http]", currency_api.refresh_rate_matrix)
+
+    # ---------------- login hashing ----------------
+    auth.register_user("bench_login", "correct horse battery staple")
+    salt_hex, hash_hex = auth.make_password_hash("pw")
+    bench("auth.make_password_hash", lambda: auth.make_password_hash("pw"))
+    bench("auth.verify_password", lambda: auth.verify_password("pw", salt_hex, hash_hex))
+
+    def login():
+        auth.clear_login_throttle()    # measure hashing, not the attempt limiter
+        auth.authenticate_user("bench_login", "correct horse battery staple")
+
+    bench("auth.authenticate_user", login)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Money Tracker benchmark suite")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default=None, help="reuse/keep this database file instead of a temp one")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+
+        if not os.path.exists(db_path):
+            t0 = time.perf_counter()
+            conn = open_bench_db(db_path)
+            populate(conn, args.users, args.transactions, args.seed, args.skew)
+            conn.close()
+            print(f"generated {args.transactions:,} rows / {args.users:,} users "
+                  f"in {time.perf_counter() - t0:.1f}s\n")
+
+        results = run_suite(db_path, args.users, args.repeat)
+
+        import core.database as database
+        database.close_connections()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "users": args.users,
+            "transactions": args.transactions,
+            "seed": args.seed,
+            "skew": args.skew,
+            "repeat": args.repeat,
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# aggregates.py
+#
+# Read side and maintenance tools for the transaction_aggregates table
+# (created and kept current by triggers, see core/migrations.py).
+#
+#   python -m core.aggregates verify          # report drift, exit 1 if any
+#   python -m core.aggregates rebuild [--user ID]
+
+import argparse
+import sqlite3
+import sys
+from typing import List, Optional
+
+from core.database import get_connection, init_db
+from core.migrations import rebuild_aggregates
+from core.tracing import traced
+
+
+@traced("db")
+def get_aggregates_for_user(user_id: int, first_month: Optional[int] = None,
+                            last_month: Optional[int] = None) -> List[sqlite3.Row]:
+    """
+    A few hundred rows instead of the full history, ordered by first
+    appearance. first_month/last_month (month indexes, inclusive) limit the
+    months; they are a range on the primary key.
+    """
+    clauses, params = ["user_id = ?"], [user_id]
+    if first_month is not None:
+        clauses.append("month >= ?")
+        params.append(first_month)
+    if last_month is not None:
+        clauses.append("month <= ?")
+        params.append(last_month)
+
+    conn = get_connection()
+    cursor = conn.execute(f"""
+        SELECT month, category, t_type, currency, amount_minor_sum, row_count, first_id
+        FROM transaction_aggregates
+        WHERE {" AND ".join(clauses)}
+        ORDER BY first_id;
+    """, params)
+    return cursor.fetchall()
+
+
+def rebuild(user_id: Optional[int] = None):
+    """Recompute aggregates from raw transactions in one write transaction."""
+    conn = get_connection()
+    with conn:
+        rebuild_aggregates(conn.cursor(), user_id)
+
+
+def verify(user_id: Optional[int] = None) -> List[dict]:
+    """
+    Compare the stored aggregates with a fresh GROUP BY over transactions.
+    Returns one dict per drifted key (empty list = consistent).
+    """
+    where = "" if user_id is None else "WHERE user_id = ?"
+    params = () if user_id is None else (user_id,)
+
+    conn = get_connection()
+    fresh = conn.execute(f"""
+        SELECT user_id, month, category, t_type, currency,
+               SUM(amount_minor) AS amount_minor_sum, COUNT(*) AS row_count, MIN(id) AS first_id
+        FROM transactions
+        {where}
+        GROUP BY user_id, month, category, t_type, currency;
+    """, params).fetchall()
+
+    stored = conn.execute(f"""
+        SELECT user_id, month, category, t_type, currency,
+               amount_minor_sum, row_count, first_id
+        FROM transaction_aggregates
+        {where};
+    """, params).fetchall()
+
+    def key(r):
+        return r["user_id"], r["month"], r["category"], r["t_type"], r["currency"]
+
+    expected = {key(r): r for r in fresh}
+    actual = {key(r): r for r in stored}
+
+    drift = []
+    for k in expected.keys() | actual.keys():
+        e, a = expected.get(k), actual.get(k)
+        if (e is None or a is None
+                or e["row_count"] != a["row_count"]
+                or e["first_id"] != a["first_id"]
+                or e["amount_minor_sum"] != a["amount_minor_sum"]):
+            drift.append({
+                "key": k,
+                "expected": dict(e) if e else None,
+                "stored": dict(a) if a else None,
+            })
+
+    return drift
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain transaction_aggregates")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--user", type=int, default=None, help="limit to one user id")
+    args = parser.parse_args(argv)
+
+    init_db()
+
+    if args.command == "rebuild":
+        rebuild(args.user)
+        print("Aggregates rebuilt.")
+        return 0
+
+    drift = verify(args.user)
+    for d in drift:
+        print(f"DRIFT {d['key']}: stored={d['stored']} expected={d['expected']}")
+    print(f"{len(drift)} drifted aggregate row(s).")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
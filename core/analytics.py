@@ -1,48 +1,290 @@
 # analytics.py
 
-from typing import Dict, List
-from core.database import get_transactions_for_user
+from datetime import date
+from typing import Callable, Dict, Optional
 
+import numpy as np
 
-# --------------------------------------------------
-# Helper: Convert SQLite rows into Python dictionaries
-# --------------------------------------------------
-def _rows_to_dicts(rows) -> List[dict]:
-    return [dict(row) for row in rows]
+from core.database import iter_transactions_for_user
+from core.models import (
+    from_epoch_day, month_first_day, month_key, month_of_day, to_epoch_day, to_major, to_minor,
+)
+from core.aggregates import get_aggregates_for_user
+from core.columnar import load_user_columns, convert_columns, convert_columns_asof, aggregate_columns
+from core.rate_history import RateHistory
+from core.tracing import traced
 
 
 # --------------------------------------------------
-# Compute total income, expenses, net balance
+# Shared accumulation (rows or aggregate groups)
 # --------------------------------------------------
-def compute_totals(convert_func, user_id: int) -> Dict[str, float]:
+def _accumulate(items, months: int) -> dict:
     """
-    convert_func(amount, currency) must convert to base currency.
-
-    Returns totals for ONLY this user.
+    items yields (month_key, category, t_type, converted_minor) in order of
+    first appearance; returns the snapshot dict described below.
+    Sums are kept in integer minor units and only converted at the end.
     """
-    rows = _rows_to_dicts(get_transactions_for_user(user_id))
-
-    total_income = 0.0
-    total_expense = 0.0
+    total_income = 0
+    total_expense = 0
+    monthly = {}
+    breakdown = {}
 
-    for row in rows:
-        converted = convert_func(row["amount"], row["currency"])
+    for month_key, cat, t_type, converted in items:
+        is_income = t_type == "Income"
 
-        if row["t_type"] == "Income":
+        if is_income:
             total_income += converted
         else:
             total_expense += converted
 
+        if month_key not in monthly:
+            monthly[month_key] = {"income": 0, "expense": 0}
+        monthly[month_key]["income" if is_income else "expense"] += converted
+
+        if cat not in breakdown:
+            breakdown[cat] = {"amount": 0, "type": t_type}
+        breakdown[cat]["amount"] += converted
+
+    # Back to major units
+    for m in monthly:
+        monthly[m]["income"] = to_major(monthly[m]["income"])
+        monthly[m]["expense"] = to_major(monthly[m]["expense"])
+
+    for cat in breakdown:
+        breakdown[cat]["amount"] = to_major(breakdown[cat]["amount"])
+
     return {
-        "income": round(total_income, 2),
-        "expense": round(total_expense, 2),
-        "net": round(total_income - total_expense, 2)
+        "totals": {
+            "income": to_major(total_income),
+            "expense": to_major(total_expense),
+            "net": to_major(total_income - total_expense)
+        },
+        "monthly": monthly,
+        "category": breakdown,
+        "forecast": _forecast_from_monthly(monthly, months),
+    }
+
+
+def _month_keys():
+    """Memoized epoch day -> "YYYY-MM" (rows repeat the same few days)."""
+    cache = {}
+
+    def key(day: int) -> str:
+        k = cache.get(day)
+        if k is None:
+            k = cache[day] = month_key(month_of_day(day))
+        return k
+
+    return key
+
+
+def _converted_rows(user_id: int, rate_for, base: Optional[str], rates: dict,
+                    start: Optional[date], end: Optional[date]):
+    """(id, item) for each raw row in start..end, rounded like convert_to_base()."""
+    key = _month_keys()
+
+    for batch in iter_transactions_for_user(user_id, start=start, end=end):
+        for _id, t_type, amount_minor, currency, category, day in batch:
+            if currency not in rates:
+                rates[currency] = 1.0 if currency == base else rate_for(currency)
+            yield _id, (key(day), category, t_type, round(amount_minor * rates[currency]))
+
+
+def _full_months(start: Optional[date], end: Optional[date]):
+    """
+    (first, last) month indexes lying entirely inside start..end; None for an
+    open end. first > last means the range holds no complete month.
+    """
+    first = last = None
+
+    if start is not None:
+        day = to_epoch_day(start)
+        first = month_of_day(day)
+        if month_first_day(first) != day:
+            first += 1
+
+    if end is not None:
+        day = to_epoch_day(end)
+        last = month_of_day(day)
+        if month_first_day(last + 1) - 1 != day:
+            last -= 1
+
+    return first, last
+
+
+def _converted_aggregates(user_id: int, rate_for, base: Optional[str],
+                          start: Optional[date] = None, end: Optional[date] = None):
+    """
+    Weight each (month, category, type, currency) native sum by its rate.
+    For a date range, whole months inside it come from the aggregates and
+    only the partial months at either edge are read row by row.
+    """
+    rates = {}
+    first, last = _full_months(start, end)
+
+    if first is not None and last is not None and first > last:
+        return [item for _id, item in _converted_rows(user_id, rate_for, base, rates, start, end)]
+
+    items = []
+    if first is not None and to_epoch_day(start) < month_first_day(first):
+        head_end = from_epoch_day(month_first_day(first) - 1)
+        items.extend(_converted_rows(user_id, rate_for, base, rates, start, head_end))
+
+    for agg in get_aggregates_for_user(user_id, first, last):
+        currency = agg["currency"]
+        if currency not in rates:
+            rates[currency] = 1.0 if currency == base else rate_for(currency)
+
+        items.append((agg["first_id"],
+                      (month_key(agg["month"]), agg["category"], agg["t_type"],
+                       round(agg["amount_minor_sum"] * rates[currency]))))
+
+    if last is not None and to_epoch_day(end) >= month_first_day(last + 1):
+        tail_start = from_epoch_day(month_first_day(last + 1))
+        items.extend(_converted_rows(user_id, rate_for, base, rates, tail_start, end))
+
+    # aggregates arrive by first_id; merge the edge rows into that order
+    items.sort(key=lambda pair: pair[0])
+    return [item for _id, item in items]
+
+
+def _converted_asof(user_id: int, history: RateHistory, rate_for, base: Optional[str],
+                    start: Optional[date], end: Optional[date]):
+    """
+    Rows in start..end converted at their own date's rate (columnar engine),
+    summed per (month, category, type) into the same items as the aggregates.
+    """
+    cols = load_user_columns(user_id, start, end)
+    if not len(cols):
+        return []
+    converted = convert_columns_asof(cols, history, rate_for, base)
+
+    n_categories = len(cols.categories)
+    group = (cols.month_codes * n_categories + cols.category_codes) * 2 + cols.is_income
+    keys, codes = np.unique(group, return_inverse=True)
+    sums = np.zeros(len(keys), dtype=np.int64)
+    np.add.at(sums, codes.ravel(), converted)
+
+    return [
+        (cols.months[k // 2 // n_categories], cols.categories[k // 2 % n_categories],
+         "Income" if k % 2 else "Expense", int(total))
+        for k, total in zip(keys.tolist(), sums.tolist())
+    ]
+
+
+def _converted_with_history(user_id: int, history: RateHistory, rate_for, base: Optional[str],
+                            start: Optional[date], end: Optional[date]):
+    """
+    Dates before the first stored quote have no history (as-of conversion
+    would fall back to the current rate anyway), so they still come from the
+    aggregates; only the rows the history covers are converted per day.
+    """
+    first_day = history.first_day()
+    covered_from = from_epoch_day(first_day) if first_day is not None else None
+
+    if covered_from is None or (end is not None and end < covered_from):
+        return _converted_aggregates(user_id, rate_for, base, start, end)
+
+    items = []
+    if start is None or start < covered_from:
+        items.extend(_converted_aggregates(user_id, rate_for, base, start,
+                                           from_epoch_day(first_day - 1)))
+    items.extend(_converted_asof(user_id, history, rate_for, base,
+                                 covered_from if start is None else max(start, covered_from), end))
+    return items
+
+
+# --------------------------------------------------
+# Dashboard snapshot (single pass over the history)
+# --------------------------------------------------
+@traced("analytics")
+def build_dashboard_snapshot(user_id: int, convert, months: int = 3,
+                             rate_for: Optional[Callable[[str], float]] = None,
+                             base: Optional[str] = None,
+                             source: str = "aggregates",
+                             start: Optional[date] = None,
+                             end: Optional[date] = None,
+                             history: Optional[RateHistory] = None) -> dict:
+    """
+    Fetch this user's transactions ONCE, convert every amount ONCE and
+    build everything the dashboard needs in the same loop:
+    {
+        "totals":   {"income": ..., "expense": ..., "net": ...},
+        "monthly":  {"2025-01": {"income": ..., "expense": ...}, ...},
+        "category": {"Food": {"amount": ..., "type": "Expense"}, ...},
+        "forecast": 123.45,
     }
+    convert(amount, currency) must convert to base currency.
+
+    If rate_for(currency) -> rate is given (`base` = base currency):
+      source="aggregates": read the pre-summed transaction_aggregates rows
+          and convert each currency's sum once. Changing base currency only
+          re-weights these sums. Converting sums instead of rounding every
+          row can differ from the per-row figures by a few cents.
+      source="rows": columnar engine over the raw rows, one rate lookup
+          per distinct currency; identical to the per-row loop.
+    With a RateHistory as well, each row the history covers (dated on or
+    after its first quote) converts at the rate on its own date instead;
+    with source="aggregates" everything older is still read from the
+    aggregates at the current rates, with source="rows" every row is.
+
+    start/end (inclusive dates, None = open) restrict everything to that
+    period; only the rows (or monthly aggregates) inside it are read.
+    """
+    if rate_for is not None and source == "aggregates":
+        if history is not None:
+            return _accumulate(_converted_with_history(user_id, history, rate_for, base,
+                                                       start, end), months)
+        return _accumulate(_converted_aggregates(user_id, rate_for, base, start, end), months)
+
+    if rate_for is not None:
+        cols = load_user_columns(user_id, start, end)
+        if history is not None:
+            converted = convert_columns_asof(cols, history, rate_for, base)
+        else:
+            converted = convert_columns(cols, rate_for, base)
+        totals, monthly, breakdown = aggregate_columns(cols, converted)
+
+        return {
+            "totals": totals,
+            "monthly": monthly,
+            "category": breakdown,
+            "forecast": _forecast_from_monthly(monthly, months),
+        }
+
+    # Plain tuples (id, t_type, amount_minor, currency, category, day),
+    # streamed in batches: no Row or dict per transaction
+    key = _month_keys()
+    return _accumulate(
+        (
+            (key(day),  # "YYYY-MM"
+             category,
+             t_type,
+             to_minor(convert(to_major(amount_minor), currency)))
+            for batch in iter_transactions_for_user(user_id, start=start, end=end)
+            for _id, t_type, amount_minor, currency, category, day in batch
+        ),
+        months,
+    )
+
+
+# --------------------------------------------------
+# Compute total income, expenses, net balance
+# --------------------------------------------------
+@traced("analytics")
+def compute_totals(convert_func, user_id: int) -> Dict[str, float]:
+    """
+    convert_func(amount, currency) must convert to base currency.
+
+    Returns totals for ONLY this user.
+    """
+    return build_dashboard_snapshot(user_id, convert_func)["totals"]
 
 
 # --------------------------------------------------
 # Breakdown by category
 # --------------------------------------------------
+@traced("analytics")
 def category_breakdown(convert_func, user_id: int):
     """
     Returns breakdown for categories for this user only.
@@ -51,30 +293,13 @@ def category_breakdown(convert_func, user_id: int):
         "Salary": {"amount": 1000.0, "type": "Income"},
     }
     """
-    rows = _rows_to_dicts(get_transactions_for_user(user_id))
-
-    breakdown = {}
-
-    for row in rows:
-        converted = convert_func(row["amount"], row["currency"])
-        cat = row["category"]
-        t_type = row["t_type"]
-
-        if cat not in breakdown:
-            breakdown[cat] = {"amount": 0.0, "type": t_type}
-
-        breakdown[cat]["amount"] += converted
-
-    # Round results
-    for cat in breakdown:
-        breakdown[cat]["amount"] = round(breakdown[cat]["amount"], 2)
-
-    return breakdown
+    return build_dashboard_snapshot(user_id, convert_func)["category"]
 
 
 # --------------------------------------------------
 # Monthly stats (grouping algorithm)
 # --------------------------------------------------
+@traced("analytics")
 def monthly_summary(convert_func, user_id: int) -> Dict[str, Dict[str, float]]:
     """
     Returns month → income/expense for this user:
@@ -83,39 +308,13 @@ def monthly_summary(convert_func, user_id: int) -> Dict[str, Dict[str, float]]:
         "2025-02": {"income": 1400, "expense": 400},
     }
     """
-    rows = _rows_to_dicts(get_transactions_for_user(user_id))
-    summary = {}
-
-    for row in rows:
-        month_key = row["date"][:7]  # "YYYY-MM"
-        converted = convert_func(row["amount"], row["currency"])
-
-        if month_key not in summary:
-            summary[month_key] = {"income": 0.0, "expense": 0.0}
-
-        if row["t_type"] == "Income":
-            summary[month_key]["income"] += converted
-        else:
-            summary[month_key]["expense"] += converted
-
-    # Round
-    for m in summary:
-        summary[m]["income"] = round(summary[m]["income"], 2)
-        summary[m]["expense"] = round(summary[m]["expense"], 2)
-
-    return summary
+    return build_dashboard_snapshot(user_id, convert_func)["monthly"]
 
 
 # --------------------------------------------------
 # Forecast (simple average of last N months)
 # --------------------------------------------------
-def forecast_next_month(convert_func, user_id: int, months: int = 3) -> float:
-    """
-    Predicts next month's net balance using average
-    of last N months for THIS user only.
-    """
-    monthly = monthly_summary(convert_func, user_id)
-
+def _forecast_from_monthly(monthly: Dict[str, Dict[str, float]], months: int) -> float:
     if len(monthly) == 0:
         return 0.0
 
@@ -131,3 +330,12 @@ def forecast_next_month(convert_func, user_id: int, months: int = 3) -> float:
         return 0.0
 
     return round(sum(nets) / len(nets), 2)
+
+
+@traced("analytics")
+def forecast_next_month(convert_func, user_id: int, months: int = 3) -> float:
+    """
+    Predicts next month's net balance using average
+    of last N months for THIS user only.
+    """
+    return build_dashboard_snapshot(user_id, convert_func, months)["forecast"]
@@ -2,56 +2,188 @@
 import os
 import hashlib
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import Tuple, Optional, Dict
-from core.database import create_user_row, get_user_row_by_username
+from core.database import create_user_row, get_user_row_by_username, update_user_password_hash
+from core.sessions import revoke_user_sessions
+from core.throttle import TokenBucketLimiter
 
 # constants
-PBKDF2_ITERATIONS = 100_000
+# Changing these is safe: existing users keep verifying with the parameters
+# stored in users.hash_params and are re-hashed on their next login.
+PBKDF2_ITERATIONS = int(os.environ.get("MONEYTRACKER_PBKDF2_ITERATIONS", 100_000))
 HASH_NAME = "sha256"
 SALT_SIZE = 16  # bytes
 
+# PBKDF2 releases the GIL, so hashing runs on a small dedicated pool instead
+# of the Streamlit script threads. At most HASH_WORKERS hashes run at once
+# and HASH_QUEUE_LIMIT more may wait; beyond that logins are refused
+# immediately instead of piling up behind each other.
+HASH_WORKERS = int(os.environ.get("MONEYTRACKER_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = 16
+HASH_TIMEOUT_SECONDS = 30
+
+# Attempt throttling (token buckets, per process)
+USER_ATTEMPTS_BURST = 5
+USER_ATTEMPTS_PER_SECOND = 1 / 12      # 5 per minute after the burst
+IP_ATTEMPTS_BURST = 20
+IP_ATTEMPTS_PER_SECOND = 1 / 3         # 20 per minute after the burst
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="pbkdf2")
+_hash_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+_user_limiter = TokenBucketLimiter(USER_ATTEMPTS_BURST, USER_ATTEMPTS_PER_SECOND)
+_ip_limiter = TokenBucketLimiter(IP_ATTEMPTS_BURST, IP_ATTEMPTS_PER_SECOND)
+
+
+class AuthRateLimited(Exception):
+    """Too many attempts, or no hashing capacity left; retry later."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# --------------------------------------------------
+# Hash parameters ("pbkdf2_sha256$100000")
+# --------------------------------------------------
+def current_hash_params() -> str:
+    return f"pbkdf2_{HASH_NAME}${PBKDF2_ITERATIONS}"
+
+
+def _parse_hash_params(params: str) -> Tuple[str, int]:
+    scheme, iterations = params.split("$")
+    return scheme[len("pbkdf2_"):], int(iterations)
+
+
 # Return raw bytes of PBKDF2-HMAC hash.
-def _hash_password(password: str, salt: bytes) -> bytes:
-    return hashlib.pbkdf2_hmac(HASH_NAME, password.encode("utf-8"), salt, PBKDF2_ITERATIONS)
+def _hash_password(password: str, salt: bytes, params: Optional[str] = None) -> bytes:
+    hash_name, iterations = _parse_hash_params(params or current_hash_params())
+    return hashlib.pbkdf2_hmac(hash_name, password.encode("utf-8"), salt, iterations)
 
-# Create salt + hash (hex). Returns (salt_hex, hash_hex).
+# Create salt + hash (hex) with the current parameters. Returns (salt_hex, hash_hex).
 def make_password_hash(password: str) -> Tuple[str, str]:
     salt = os.urandom(SALT_SIZE)
     hashed = _hash_password(password, salt)
     return salt.hex(), hashed.hex()
 
-def verify_password(password: str, salt_hex: str, hash_hex: str) -> bool:
+def verify_password(password: str, salt_hex: str, hash_hex: str, params: Optional[str] = None) -> bool:
     salt = bytes.fromhex(salt_hex)
     expected = bytes.fromhex(hash_hex)
-    computed = _hash_password(password, salt)
+    computed = _hash_password(password, salt, params)
     return secrets.compare_digest(computed, expected)
 
+
+# --------------------------------------------------
+# Bounded hashing pool and throttling
+# --------------------------------------------------
+def _run_hash(fn, *args):
+    """Run fn(*args) on the hashing pool, refusing work when it is saturated."""
+    if not _hash_slots.acquire(blocking=False):
+        raise AuthRateLimited("The server is busy. Please try again in a moment.", 1.0)
+
+    try:
+        future = _hash_pool.submit(fn, *args)
+    except Exception:
+        _hash_slots.release()
+        raise
+
+    future.add_done_callback(lambda _f: _hash_slots.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        # the hash keeps its slot until it finishes; the caller gives up now
+        raise AuthRateLimited("The server is busy. Please try again in a moment.", 5.0)
+
+
+def _throttle(username: str, ip: Optional[str]):
+    """Take one attempt token for this IP and username or raise AuthRateLimited."""
+    checks = [(_user_limiter, username.lower())]
+    if ip:
+        checks.insert(0, (_ip_limiter, ip))
+
+    for limiter, key in checks:
+        allowed, retry_after = limiter.try_acquire(key)
+        if not allowed:
+            raise AuthRateLimited(
+                f"Too many attempts. Try again in {int(retry_after) + 1} seconds.",
+                retry_after,
+            )
+
+
+def clear_login_throttle():
+    """Forget all attempt counters (e.g. after an admin unlocks accounts)."""
+    _user_limiter.clear()
+    _ip_limiter.clear()
+
+
 #Create a new user. Returns (ok, error_message).
-def register_user(username: str, password: str) -> Tuple[bool, Optional[str]]:
+def register_user(username: str, password: str, ip: Optional[str] = None) -> Tuple[bool, Optional[str]]:
     username = username.strip()
     if not username or not password:
         return False, "Username and password are required."
 
+    # throttled before the lookup, so registration cannot be used to probe
+    # for existing usernames at full speed
+    try:
+        _throttle(username, ip)
+    except AuthRateLimited as e:
+        return False, str(e)
+
     existing = get_user_row_by_username(username)
     if existing:
         return False, "Username already exists."
 
-    salt_hex, hash_hex = make_password_hash(password)
     try:
-        create_user_row(username, hash_hex, salt_hex)
+        salt_hex, hash_hex = _run_hash(make_password_hash, password)
+        create_user_row(username, hash_hex, salt_hex, current_hash_params())
         return True, None
     except Exception as e:
         return False, str(e)
 
 # If credentials valid, return user dict (id, username). Otherwise, None.
-def authenticate_user(username: str, password: str) -> Optional[Dict]:
-    row = get_user_row_by_username(username.strip())
+# Raises AuthRateLimited when the attempt is throttled or hashing is saturated
+# (or a hash did not finish within HASH_TIMEOUT_SECONDS).
+def authenticate_user(username: str, password: str, ip: Optional[str] = None) -> Optional[Dict]:
+    username = username.strip()
+    _throttle(username, ip)
+
+    row = get_user_row_by_username(username)
     if not row:
         return None
 
     salt_hex = row["salt"]
     hash_hex = row["password_hash"]
-    if verify_password(password, salt_hex, hash_hex):
-        return {"id": row["id"], "username": row["username"]}
+    params = row["hash_params"]
+    if not _run_hash(verify_password, password, salt_hex, hash_hex, params):
+        return None
+
+    # Transparent upgrade when the configured hash parameters changed;
+    # if the pool is saturated it simply happens on a later login.
+    if params != current_hash_params():
+        try:
+            new_salt, new_hash = _run_hash(make_password_hash, password)
+        except AuthRateLimited:
+            pass
+        else:
+            update_user_password_hash(row["id"], new_hash, new_salt, current_hash_params())
+
+    return {"id": row["id"], "username": row["username"]}
+
+
+# Replace a user's password after checking the current one, then log the
+# user out everywhere. Returns (ok, error_message).
+# Raises AuthRateLimited like authenticate_user().
+def change_password(username: str, current_password: str, new_password: str,
+                    ip: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    if not new_password:
+        return False, "The new password cannot be empty."
+
+    user = authenticate_user(username, current_password, ip)
+    if user is None:
+        return False, "The current password is incorrect."
 
-    return None
+    salt_hex, hash_hex = _run_hash(make_password_hash, new_password)
+    update_user_password_hash(user["id"], hash_hex, salt_hex, current_hash_params())
+    revoke_user_sessions(user["id"])
+    return True, None
@@ -0,0 +1,145 @@
+# chartdata.py
+#
+# Chart-data preparation: turns snapshot dicts into what the dashboard
+# plots, with a hard cap on the points each figure sends to the browser.
+# Only the plotted series are reduced; the snapshot totals are untouched.
+#
+#   monthly bars   consecutive months merged into quarters/halves/years
+#                  (sums, so every bar is still exact)
+#   net trend      Largest-Triangle-Three-Buckets downsampling (keeps the
+#                  shape; every kept point is a real month's value)
+#   categories     the top N plus one "Other" bucket per type
+
+from datetime import date
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from core.models import to_major, to_minor
+
+MAX_BAR_GROUPS = 60     # x positions on the monthly chart (2 bars each)
+MAX_LINE_POINTS = 120   # points on the net trend
+MAX_LABELED_POINTS = 24     # per-point text labels only up to this many
+TOP_CATEGORIES = 15
+
+# months per bar -> label for a group starting at (year, month 1-12)
+_GROUPINGS = [
+    (1, lambda y, m: date(y, m, 1).strftime("%b %Y")),
+    (3, lambda y, m: f"Q{(m - 1) // 3 + 1} {y}"),
+    (6, lambda y, m: f"H{(m - 1) // 6 + 1} {y}"),
+    (12, lambda y, m: str(y)),
+]
+
+
+def _month_index(key: str) -> int:
+    """ "YYYY-MM" -> months since year 0."""
+    return int(key[:4]) * 12 + int(key[5:7]) - 1
+
+
+# --------------------------------------------------
+# Monthly income vs expense
+# --------------------------------------------------
+def _grouping(first: int, last: int, cap: int):
+    """(months per group, label function) giving at most `cap` groups."""
+    for step, label in _GROUPINGS:
+        if last // step - first // step + 1 <= cap:
+            return step, label
+
+    years = 1
+    while last // (12 * years) - first // (12 * years) + 1 > cap:
+        years += 1
+    return 12 * years, lambda y, m: f"{y}–{y + years - 1}"
+
+
+def monthly_bars(monthly: Dict[str, dict], cap: int = MAX_BAR_GROUPS) -> Tuple[List[str], List[float], List[float]]:
+    """
+    (labels, incomes, expenses) in month order, merged into calendar
+    quarters, halves or years when there are more than `cap` months.
+    """
+    keys = sorted(monthly)
+    if not keys:
+        return [], [], []
+
+    step, label = _grouping(_month_index(keys[0]), _month_index(keys[-1]), cap)
+
+    groups = {}     # group index -> [income_minor, expense_minor]
+    for key in keys:
+        g = groups.setdefault(_month_index(key) // step, [0, 0])
+        g[0] += to_minor(monthly[key]["income"])
+        g[1] += to_minor(monthly[key]["expense"])
+
+    labels, incomes, expenses = [], [], []
+    for g, (income, expense) in groups.items():
+        start = g * step
+        labels.append(label(start // 12, start % 12 + 1))
+        incomes.append(to_major(income))
+        expenses.append(to_major(expense))
+    return labels, incomes, expenses
+
+
+# --------------------------------------------------
+# Net balance trend
+# --------------------------------------------------
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps (Steinarsson
+    2013). x must be ascending. First and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # n-2 inner points in threshold-2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # next bucket's average (the last point for the final bucket)
+        nlo, nhi = (edges[b + 1], edges[b + 2]) if b + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[b + 1] = a
+
+    return keep
+
+
+def net_trend(monthly: Dict[str, dict], cap: int = MAX_LINE_POINTS) -> Tuple[List[str], List[float]]:
+    """(labels, net balances) per month, LTTB-downsampled to at most `cap` points."""
+    keys = sorted(monthly)
+    nets = [to_major(to_minor(monthly[k]["income"]) - to_minor(monthly[k]["expense"])) for k in keys]
+
+    if len(keys) > cap:
+        x = np.array([_month_index(k) for k in keys], dtype=np.float64)
+        kept = lttb(x, np.array(nets, dtype=np.float64), cap)
+        keys = [keys[i] for i in kept]
+        nets = [nets[i] for i in kept]
+
+    labels = [date(int(k[:4]), int(k[5:7]), 1).strftime("%b %Y") for k in keys]
+    return labels, nets
+
+
+# --------------------------------------------------
+# Category breakdown
+# --------------------------------------------------
+def top_categories(breakdown: Dict[str, dict], n: int = TOP_CATEGORIES) -> Dict[str, dict]:
+    """
+    The n largest categories, largest first, plus "Other (Income)" /
+    "Other (Expense)" holding the exact sum of the rest of each type.
+    """
+    if len(breakdown) <= n:
+        return breakdown
+
+    ranked = sorted(breakdown.items(), key=lambda item: item[1]["amount"], reverse=True)
+    top = dict(ranked[:n])
+
+    rest = {}
+    for _name, entry in ranked[n:]:
+        rest[entry["type"]] = rest.get(entry["type"], 0) + to_minor(entry["amount"])
+    for t_type, total in rest.items():
+        top[f"Other ({t_type})"] = {"amount": to_major(total), "type": t_type}
+    return top
@@ -0,0 +1,181 @@
+# columnar.py
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.database import iter_transactions_for_user
+from core.models import CATEGORY_CODES, CURRENCY_CODES, TransactionBatch, month_key, to_major
+from core.rate_history import RateHistory
+from core.tracing import traced
+
+
+# --------------------------------------------------
+# Column store for one user's transactions
+# --------------------------------------------------
+@dataclass
+class TransactionColumns:
+    """
+    A user's history as parallel NumPy arrays (row order = id order, or
+    (day, id) order when loaded for a date range).
+    String columns are factorized: *_codes index into the matching list,
+    which is in order of first appearance.
+    """
+    amount_minor: np.ndarray        # int64, hundredths of the native currency
+    is_income: np.ndarray           # bool
+    currency_codes: np.ndarray      # intp
+    currencies: List[str]
+    days: np.ndarray                # int64, days since 1970-01-01
+    month_codes: np.ndarray         # intp, "YYYY-MM"
+    months: List[str]
+    category_codes: np.ndarray      # intp
+    categories: List[str]
+    category_types: List[str]       # t_type of each category's first row
+
+    def __len__(self):
+        return len(self.amount_minor)
+
+
+def _factorize(values) -> Tuple[np.ndarray, List[str]]:
+    codes, uniques = pd.factorize(values, sort=False)
+    return codes, list(uniques)
+
+
+@traced("analytics")
+def load_user_columns(user_id: int, start: Optional[date] = None,
+                      end: Optional[date] = None) -> TransactionColumns:
+    """
+    Read this user's transactions (optionally only those dated start..end)
+    straight into columns, with no dict per row: each fetched batch is
+    appended to a TransactionBatch and the columns are views over it.
+    """
+    batch = TransactionBatch()
+    for rows in iter_transactions_for_user(user_id, 50_000, start, end):
+        batch.extend(rows)
+
+    days = batch.numpy_days().astype(np.int64)
+    # months since 1970-01, by calendar arithmetic on the epoch days
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    is_income = batch.numpy_is_income()
+
+    # the batch's interned codes are process-wide; renumber them densely
+    # for this user so the grouped sums stay small
+    currency_codes, currency_ids = _factorize(batch.numpy_currency_codes())
+    month_codes, month_list = _factorize(months)
+    category_codes, category_ids = _factorize(batch.numpy_category_codes())
+
+    # t_type of the first row seen for each category
+    _, first_rows = np.unique(category_codes, return_index=True)
+
+    return TransactionColumns(
+        amount_minor=batch.numpy_amount_minor(),
+        is_income=is_income,
+        currency_codes=currency_codes,
+        currencies=[CURRENCY_CODES.name(int(c)) for c in currency_ids],
+        days=days,
+        month_codes=month_codes,
+        months=[month_key(int(m)) for m in month_list],
+        category_codes=category_codes,
+        categories=[CATEGORY_CODES.name(int(c)) for c in category_ids],
+        category_types=["Income" if is_income[i] else "Expense" for i in first_rows],
+    )
+
+
+# --------------------------------------------------
+# Conversion: one rate per currency, applied as a vector
+# --------------------------------------------------
+@traced("analytics")
+def convert_columns(cols: TransactionColumns, rate_for: Callable[[str], float],
+                    base: Optional[str] = None) -> np.ndarray:
+    """
+    Convert every amount to base-currency minor units (int64), rounding each
+    row to the nearest minor unit like convert_to_base().
+    rate_for(currency) is called once per DISTINCT currency; amounts already
+    in `base` pass through unchanged.
+    """
+    rates = np.array([rate_for(c) for c in cols.currencies], dtype=np.float64)
+    converted = np.rint(cols.amount_minor * rates[cols.currency_codes]).astype(np.int64)
+
+    if base in cols.currencies:
+        in_base = cols.currency_codes == cols.currencies.index(base)
+        converted[in_base] = cols.amount_minor[in_base]
+
+    return converted
+
+
+@traced("analytics")
+def convert_columns_asof(cols: TransactionColumns, history: RateHistory,
+                         rate_for: Callable[[str], float], base: str) -> np.ndarray:
+    """
+    Like convert_columns(), but each row converts at the rate on its own
+    date (see core/rate_history.py). The distinct days are sorted once and
+    merged against each currency's quote series, giving a small
+    (currency x day) rate table that every row indexes into; rows outside
+    the stored history use rate_for(currency).
+    """
+    days, day_codes = np.unique(cols.days, return_inverse=True)
+    table = history.rate_table(base, cols.currencies, days)
+
+    missing = np.isnan(table)
+    if missing.any():
+        current = np.array([rate_for(c) for c in cols.currencies], dtype=np.float64)
+        table = np.where(missing, current[:, None], table)
+
+    rates = table[cols.currency_codes, day_codes.ravel()]
+    converted = np.rint(cols.amount_minor * rates).astype(np.int64)
+
+    if base in cols.currencies:
+        in_base = cols.currency_codes == cols.currencies.index(base)
+        converted[in_base] = cols.amount_minor[in_base]
+
+    return converted
+
+
+# --------------------------------------------------
+# Grouped reductions
+# --------------------------------------------------
+# Everything is summed in integer minor units, so the result does not
+# depend on summation order and never accumulates float error.
+def _grouped_sum(codes: np.ndarray, values: np.ndarray, groups: int) -> np.ndarray:
+    sums = np.zeros(groups, dtype=np.int64)
+    np.add.at(sums, codes, values)
+    return sums
+
+
+@traced("analytics")
+def aggregate_columns(cols: TransactionColumns, converted: np.ndarray):
+    """Return (totals, monthly, category) in the analytics dict formats."""
+    income = np.where(cols.is_income, converted, 0)
+    expense = np.where(cols.is_income, 0, converted)
+
+    total_income = int(income.sum())
+    total_expense = int(expense.sum())
+
+    n_months = len(cols.months)
+    month_income = _grouped_sum(cols.month_codes, income, n_months)
+    month_expense = _grouped_sum(cols.month_codes, expense, n_months)
+
+    category_amount = _grouped_sum(cols.category_codes, converted, len(cols.categories))
+
+    totals = {
+        "income": to_major(total_income),
+        "expense": to_major(total_expense),
+        "net": to_major(total_income - total_expense)
+    }
+
+    monthly: Dict[str, Dict[str, float]] = {
+        m: {"income": to_major(int(month_income[i])),
+            "expense": to_major(int(month_expense[i]))}
+        for i, m in enumerate(cols.months)
+    }
+
+    breakdown = {
+        cat: {"amount": to_major(int(category_amount[i])),
+              "type": cols.category_types[i]}
+        for i, cat in enumerate(cols.categories)
+    }
+
+    return totals, monthly, breakdown
@@ -1,206 +1,666 @@
 # database.py
 
+import json
 import sqlite3
+import secrets
+import threading
+import atexit
 from typing import List, Optional
-from core.models import Transaction
+from core.models import MAX_EPOCH_DAY, MIN_EPOCH_DAY, Transaction, ValidationError, to_epoch_day
+from core.migrations import run_migrations
+from core.tracing import traced
 import os
-from datetime import datetime
+from datetime import date, datetime
 
 DB_NAME = os.path.join(os.path.dirname(__file__), "moneytracker.db")
 
+# Connection tuning
+PAGE_CACHE_KB = 16_384          # negative cache_size => size in KiB (16 MiB)
+STATEMENT_CACHE_SIZE = 256      # prepared statements kept per connection
+BUSY_TIMEOUT_SECONDS = 5.0
+
 
 # --------------------------------------------------
 # DATABASE CONNECTION
 # --------------------------------------------------
-def get_connection():
-    conn = sqlite3.connect(DB_NAME)
+# Each thread gets its own connection, so connections are never shared
+# between threads. Streamlit starts a new script thread for every rerun,
+# so in the app this is one connection per rerun; it is reused by all the
+# queries of that rerun. Long-lived threads (the rate refresher, the hashing
+# and precompute pools, the CLIs) keep theirs. The registry only exists so
+# the connections of finished threads can be reaped and everything can be
+# closed on shutdown.
+_local = threading.local()
+_registry = {}                  # thread ident -> (thread, path, connection)
+_registry_lock = threading.Lock()
+_generation = 0                 # bumped by close_connections()
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_SECONDS,
+        check_same_thread=False,   # only so close_connections() can run at exit
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA cache_size = -{PAGE_CACHE_KB};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    return conn
+
+
+def _reap_dead_threads():
+    """Close connections owned by threads that no longer exist."""
+    for ident, (thread, _path, conn) in list(_registry.items()):
+        if not thread.is_alive():
+            conn.close()
+            del _registry[ident]
+
+
+def get_connection():
+    """
+    Return this thread's persistent connection, opening it on first use.
+    Callers must NOT close it; use close_connections() on shutdown.
+    """
+    conn = getattr(_local, "conn", None)
+    if (conn is not None and _local.path == DB_NAME
+            and _local.generation == _generation):
+        return conn
+
+    thread = threading.current_thread()
+    with _registry_lock:
+        _reap_dead_threads()
+
+        old = _registry.pop(thread.ident, None)
+        if old is not None:
+            old[2].close()
+
+        conn = _open_connection(DB_NAME)
+        _registry[thread.ident] = (thread, DB_NAME, conn)
+
+    _local.conn = conn
+    _local.path = DB_NAME
+    _local.generation = _generation
     return conn
 
 
+def close_connections():
+    """
+    Shutdown hook: close every thread's connection. Threads that keep
+    running simply reopen a fresh connection on their next call.
+    """
+    global _generation
+
+    with _registry_lock:
+        for _thread, _path, conn in _registry.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _registry.clear()
+        _generation += 1
+
+
+atexit.register(close_connections)
+
+
 # --------------------------------------------------
 # DATABASE INITIALIZATION
 # --------------------------------------------------
+@traced("db")
 def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Transactions table (original)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            t_type TEXT NOT NULL,
-            amount REAL NOT NULL,
-            currency TEXT NOT NULL,
-            category TEXT NOT NULL,
-            date TEXT NOT NULL,
-            user_id INTEGER
-        );
-    """)
-
-    # Users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password_hash TEXT NOT NULL,
-            salt TEXT NOT NULL,
-            created_at TEXT NOT NULL
-        );
-    """)
-
-    conn.commit()
-    conn.close()
+    """Create or upgrade the schema (see core/migrations.py)."""
+    run_migrations(get_connection())
 
 
 # --------------------------------------------------
 # USER HELPERS (used by auth system)
 # --------------------------------------------------
-def create_user_row(username: str, password_hash: str, salt: str) -> int:
+@traced("db")
+def create_user_row(username: str, password_hash: str, salt: str, hash_params: str) -> int:
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO users (username, password_hash, salt, created_at)
-        VALUES (?, ?, ?, ?)
-    """, (username, password_hash, salt, datetime.now().isoformat()))
-    conn.commit()
-    new_id = cursor.lastrowid
-    conn.close()
-    return new_id
+    with conn:
+        cursor = conn.execute("""
+            INSERT INTO users (username, password_hash, salt, hash_params, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (username, password_hash, salt, hash_params, datetime.now().isoformat()))
+    return cursor.lastrowid
+
+
+@traced("db")
+def update_user_password_hash(user_id: int, password_hash: str, salt: str, hash_params: str):
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            UPDATE users
+            SET password_hash = ?, salt = ?, hash_params = ?
+            WHERE id = ?;
+        """, (password_hash, salt, hash_params, user_id))
 
 
+@traced("db")
 def get_user_row_by_username(username: str) -> Optional[sqlite3.Row]:
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ?;", (username,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    cursor = conn.execute("SELECT * FROM users WHERE username = ?;", (username,))
+    return cursor.fetchone()
 
 
 # --------------------------------------------------
 # ADD TRANSACTION
 # --------------------------------------------------
+@traced("db")
 def add_transaction(transaction: Transaction, user_id: int) -> int:
     conn = get_connection()
-    cursor = conn.cursor()
 
-    cursor.execute("""
-        INSERT INTO transactions (t_type, amount, currency, category, date, user_id)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        transaction.t_type,
-        transaction.amount,
-        transaction.currency,
-        transaction.category,
-        transaction.date.strftime("%Y-%m-%d"),
-        user_id
-    ))
+    with conn:
+        cursor = conn.execute("""
+            INSERT INTO transactions (t_type, amount_minor, currency, category, day, note, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            transaction.t_type,
+            transaction.amount_minor,
+            transaction.currency,
+            transaction.category,
+            to_epoch_day(transaction.date),
+            transaction.note,
+            user_id
+        ))
 
-    conn.commit()
-    row_id = cursor.lastrowid
-    conn.close()
-    return row_id
+    return cursor.lastrowid
 
 
 # --------------------------------------------------
 # FETCH transactions for logged-in user
 # --------------------------------------------------
+@traced("db")
 def get_transactions_for_user(user_id: int) -> List[sqlite3.Row]:
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+    cursor = conn.execute("""
         SELECT * FROM transactions
         WHERE user_id = ?
         ORDER BY id;
     """, (user_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    return cursor.fetchall()
+
+
+def _day_range_clause(start: Optional[date], end: Optional[date]):
+    """SQL fragment + params for an inclusive [start, end] date range."""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("AND day >= ?")
+        params.append(to_epoch_day(start))
+    if end is not None:
+        clauses.append("AND day <= ?")
+        params.append(to_epoch_day(end))
+    return " ".join(clauses), params
+
+
+@traced("db")
+def get_transactions_for_user_in_range(user_id: int, start: Optional[date],
+                                       end: Optional[date]) -> List[sqlite3.Row]:
+    """
+    This user's transactions dated start..end (inclusive; None = open),
+    oldest first. Served by the (user_id, day) index, so only rows in the
+    range are read.
+    """
+    where, params = _day_range_clause(start, end)
+    conn = get_connection()
+    cursor = conn.execute(f"""
+        SELECT * FROM transactions
+        WHERE user_id = ? {where}
+        ORDER BY day, id;
+    """, [user_id, *params])
+    return cursor.fetchall()
+
+
+@traced("db")
+def iter_transactions_for_user(user_id: int, batch_size: int = 10_000,
+                               start: Optional[date] = None, end: Optional[date] = None,
+                               with_note: bool = False):
+    """
+    Stream this user's transactions as lists of at most batch_size plain
+    tuples (id, t_type, amount_minor, currency, category, day), without ever
+    materializing the full result set, in id order. start/end optionally
+    restrict the dates (inclusive); the (user_id, day) index finds those
+    rows and only they are sorted. with_note appends the note to each tuple.
+    """
+    where, params = _day_range_clause(start, end)
+    note = ", note" if with_note else ""
+    cursor = get_connection().cursor()
+    cursor.row_factory = None
+    cursor.execute(f"""
+        SELECT id, t_type, amount_minor, currency, category, day{note}
+        FROM transactions
+        WHERE user_id = ? {where}
+        ORDER BY id;
+    """, [user_id, *params])
+
+    try:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+    finally:
+        cursor.close()
 
 
 # --------------------------------------------------
-# UPDATE TRANSACTION
+# PAGINATED / POINT LOOKUPS (constant cost per page)
 # --------------------------------------------------
-def update_transaction_for_user(row_id: int, transaction: Transaction, user_id: int) -> bool:
+# sort name -> key columns; every key ends with id so it is unique
+PAGE_SORTS = {
+    "id": ("id",),
+    "date": ("day", "id"),
+}
+
+
+def page_cursor(row: sqlite3.Row, sort: str = "id") -> tuple:
+    """Keyset cursor for the row a page ended on (pass as `after`)."""
+    return tuple(row[col] for col in PAGE_SORTS[sort])
+
+
+@traced("db")
+def get_transactions_page(user_id: int, limit: int = 50, after: Optional[tuple] = None,
+                          sort: str = "id", descending: bool = False,
+                          t_type: Optional[str] = None, currency: Optional[str] = None,
+                          category: Optional[str] = None) -> List[sqlite3.Row]:
+    """
+    One keyset page of this user's transactions:
+        WHERE user_id = ? AND (sort key) > (after) ORDER BY sort key LIMIT ?
+    Filtering and sorting happen in SQLite. `after` comes from page_cursor()
+    of the previous page's last row; None starts at the beginning.
+    """
+    keys = PAGE_SORTS[sort]
+    direction = "DESC" if descending else "ASC"
+
+    clauses = ["user_id = ?"]
+    params: list = [user_id]
+
+    if after is not None:
+        clauses.append(f"({', '.join(keys)}) {'<' if descending else '>'} ({', '.join('?' * len(keys))})")
+        params.extend(after)
+    if t_type:
+        clauses.append("t_type = ?")
+        params.append(t_type)
+    if currency:
+        clauses.append("currency = ?")
+        params.append(currency)
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+
+    params.append(limit)
+
     conn = get_connection()
-    cursor = conn.cursor()
+    cursor = conn.execute(f"""
+        SELECT * FROM transactions
+        WHERE {" AND ".join(clauses)}
+        ORDER BY {", ".join(f"{k} {direction}" for k in keys)}
+        LIMIT ?;
+    """, params)
+    return cursor.fetchall()
 
-    cursor.execute("""
-        UPDATE transactions
-        SET t_type = ?, amount = ?, currency = ?, category = ?, date = ?
+
+@traced("db")
+def get_transaction_by_id(row_id: int, user_id: int) -> Optional[sqlite3.Row]:
+    conn = get_connection()
+    cursor = conn.execute("""
+        SELECT * FROM transactions
         WHERE id = ? AND user_id = ?;
-    """, (
-        transaction.t_type,
-        transaction.amount,
-        transaction.currency,
-        transaction.category,
-        transaction.date.strftime("%Y-%m-%d"),
-        row_id,
-        user_id
-    ))
+    """, (row_id, user_id))
+    return cursor.fetchone()
 
-    conn.commit()
-    updated = cursor.rowcount == 1
-    conn.close()
-    return updated
+
+@traced("db")
+def count_transactions_for_user(user_id: int) -> int:
+    """Row count from the aggregates table (a few hundred rows, not the history)."""
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT COALESCE(SUM(row_count), 0) AS n
+        FROM transaction_aggregates
+        WHERE user_id = ?;
+    """, (user_id,)).fetchone()
+    return row["n"]
+
+
+# --------------------------------------------------
+# UPDATE TRANSACTION
+# --------------------------------------------------
+@traced("db")
+def update_transaction_for_user(row_id: int, transaction: Transaction, user_id: int) -> bool:
+    conn = get_connection()
+
+    with conn:
+        cursor = conn.execute("""
+            UPDATE transactions
+            SET t_type = ?, amount_minor = ?, currency = ?, category = ?, day = ?, note = ?
+            WHERE id = ? AND user_id = ?;
+        """, (
+            transaction.t_type,
+            transaction.amount_minor,
+            transaction.currency,
+            transaction.category,
+            to_epoch_day(transaction.date),
+            transaction.note,
+            row_id,
+            user_id
+        ))
+
+    return cursor.rowcount == 1
 
 
 # --------------------------------------------------
 # DELETE TRANSACTION
 # --------------------------------------------------
+@traced("db")
 def delete_transaction_for_user(row_id: int, user_id: int) -> bool:
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        DELETE FROM transactions
-        WHERE id = ? AND user_id = ?;
-    """, (row_id, user_id))
-    conn.commit()
 
-    deleted = cursor.rowcount == 1
-    conn.close()
-    return deleted
+    with conn:
+        cursor = conn.execute("""
+            DELETE FROM transactions
+            WHERE id = ? AND user_id = ?;
+        """, (row_id, user_id))
+
+    return cursor.rowcount == 1
+
+
+# --------------------------------------------------
+# BULK EDIT / DELETE (one executemany, one transaction)
+# --------------------------------------------------
+@traced("db")
+def update_transactions_bulk(user_id: int, row_ids: List[int], category: Optional[str] = None,
+                             currency: Optional[str] = None, shift_days: int = 0) -> int:
+    """
+    Set category and/or currency (None = keep) and move the date by
+    shift_days on every listed row of this user. Returns rows changed.
+    Raises ValidationError, writing nothing, if a shifted date would fall
+    outside 0001-01-01..9999-12-31.
+    """
+    conn = get_connection()
+
+    with conn:
+        if shift_days:
+            row = conn.execute("""
+                SELECT MIN(day) AS first, MAX(day) AS last FROM transactions
+                WHERE user_id = ? AND id IN (SELECT value FROM json_each(?));
+            """, (user_id, json.dumps(row_ids))).fetchone()
+            if row["first"] is not None and not (
+                    MIN_EPOCH_DAY <= row["first"] + shift_days
+                    and row["last"] + shift_days <= MAX_EPOCH_DAY):
+                raise ValidationError("Shifted dates must stay between 0001-01-01 and 9999-12-31.")
+
+        cursor = conn.executemany("""
+            UPDATE transactions
+            SET category = COALESCE(?, category),
+                currency = COALESCE(?, currency),
+                day = day + ?
+            WHERE id = ? AND user_id = ?;
+        """, [(category, currency, shift_days, row_id, user_id) for row_id in row_ids])
+
+    return cursor.rowcount
+
+
+@traced("db")
+def delete_transactions_bulk(user_id: int, row_ids: List[int]) -> int:
+    """Delete every listed row of this user; returns rows deleted."""
+    conn = get_connection()
+
+    with conn:
+        cursor = conn.executemany("""
+            DELETE FROM transactions
+            WHERE id = ? AND user_id = ?;
+        """, [(row_id, user_id) for row_id in row_ids])
+
+    return cursor.rowcount
 
 
 # --------------------------------------------------
 # SETTINGS TABLE
 # --------------------------------------------------
+@traced("db")
 def init_settings():
     conn = get_connection()
-    cursor = conn.cursor()
 
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT NOT NULL
-        );
-    """)
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
 
-    cursor.execute("""
-        INSERT OR IGNORE INTO settings (key, value)
-        VALUES ('base_currency', 'USD');
-    """)
+        conn.execute("""
+            INSERT OR IGNORE INTO settings (key, value)
+            VALUES ('base_currency', 'USD');
+        """)
 
-    conn.commit()
-    conn.close()
+        # Signing key for session tokens; generated once per database
+        conn.execute("""
+            INSERT OR IGNORE INTO settings (key, value)
+            VALUES ('session_secret', ?);
+        """, (secrets.token_hex(32),))
 
 
+@traced("db")
 def get_setting(key: str) -> str:
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = ?;", (key,))
-    row = cursor.fetchone()
-    conn.close()
+    row = conn.execute("SELECT value FROM settings WHERE key = ?;", (key,)).fetchone()
     return row["value"] if row else None
 
 
+@traced("db")
 def set_setting(key: str, value: str):
     conn = get_connection()
-    cursor = conn.cursor()
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO settings (key, value)
+            VALUES (?, ?);
+        """, (key, value))
+
+
+
+@traced("db")
+def get_user_setting(user_id: int, key: str) -> Optional[str]:
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT value FROM user_settings WHERE user_id = ? AND key = ?;
+    """, (user_id, key)).fetchone()
+    return row["value"] if row else None
+
+
+@traced("db")
+def set_user_setting(user_id: int, key: str, value: str):
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO user_settings (user_id, key, value)
+            VALUES (?, ?, ?);
+        """, (user_id, key, value))
+
+# --------------------------------------------------
+# SESSIONS
+# --------------------------------------------------
+@traced("db")
+def insert_session(token_hash: str, user_id: int, created_at: float, expires_at: float):
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            INSERT INTO sessions (token_hash, user_id, created_at, expires_at)
+            VALUES (?, ?, ?, ?);
+        """, (token_hash, user_id, created_at, expires_at))
+
+
+@traced("db")
+def get_session_row(token_hash: str) -> Optional[sqlite3.Row]:
+    """Session joined with its user: (user_id, username, expires_at), or None."""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT s.user_id, u.username, s.expires_at
+        FROM sessions s JOIN users u ON u.id = s.user_id
+        WHERE s.token_hash = ?;
+    """, (token_hash,)).fetchone()
+
+
+@traced("db")
+def get_session_hashes_for_user(user_id: int) -> List[str]:
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT token_hash FROM sessions WHERE user_id = ?;
+    """, (user_id,)).fetchall()
+    return [row["token_hash"] for row in rows]
+
+
+@traced("db")
+def delete_sessions(token_hashes: List[str]):
+    conn = get_connection()
+    with conn:
+        conn.executemany("""
+            DELETE FROM sessions WHERE token_hash = ?;
+        """, ((h,) for h in token_hashes))
+
+
+@traced("db")
+def get_session_revocation_version() -> int:
+    """Trigger-maintained count of revoked live sessions, shared by every process."""
+    row = get_connection().execute("SELECT version FROM session_revocations;").fetchone()
+    return row["version"] if row else 0
+
+
+@traced("db")
+def delete_expired_sessions(now: float) -> int:
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute("DELETE FROM sessions WHERE expires_at <= ?;", (now,))
+    return cursor.rowcount
+
+
+# --------------------------------------------------
+# EXCHANGE RATE CACHE
+# --------------------------------------------------
+@traced("db")
+def get_stored_rate(base: str, quote: str) -> Optional[sqlite3.Row]:
+    """Return (rate, fetched_at) for 1 QUOTE -> BASE, or None."""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT rate, fetched_at FROM exchange_rates
+        WHERE base = ? AND quote = ?;
+    """, (base, quote)).fetchone()
+
+
+@traced("db")
+def store_rate(base: str, quote: str, rate: float, fetched_at: float):
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO exchange_rates (base, quote, rate, fetched_at)
+            VALUES (?, ?, ?, ?);
+        """, (base, quote, rate, fetched_at))
+
+
+@traced("db")
+def store_rates(rows):
+    """Bulk upsert of (base, quote, rate, fetched_at) tuples."""
+    conn = get_connection()
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO exchange_rates (base, quote, rate, fetched_at)
+            VALUES (?, ?, ?, ?);
+        """, rows)
+
+
+@traced("db")
+def get_stored_rates_for_quote(quote: str) -> List[sqlite3.Row]:
+    """Every stored (base, rate, fetched_at) priced against one QUOTE."""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT base, rate, fetched_at FROM exchange_rates
+        WHERE quote = ?;
+    """, (quote,)).fetchall()
+
+
+# --------------------------------------------------
+# STORED DASHBOARDS (see core/precompute.py)
+# --------------------------------------------------
+@traced("db")
+def get_user_ids() -> List[int]:
+    conn = get_connection()
+    return [r["id"] for r in conn.execute("SELECT id FROM users ORDER BY id;")]
+
+
+@traced("db")
+def get_stored_data_version(user_id: int) -> int:
+    """Trigger-maintained write counter, shared by every process."""
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT version FROM user_data_versions
+        WHERE user_id = ?;
+    """, (user_id,)).fetchone()
+    return row["version"] if row else 0
+
+
+@traced("db")
+def get_dashboard_snapshot_row(user_id: int) -> Optional[sqlite3.Row]:
+    conn = get_connection()
+    return conn.execute("""
+        SELECT base, data_version, history_version, rates_fetched_at, computed_at, payload
+        FROM dashboard_snapshots
+        WHERE user_id = ?;
+    """, (user_id,)).fetchone()
+
+
+@traced("db")
+def store_dashboard_snapshots(rows):
+    """
+    Upsert (user_id, base, data_version, history_version, rates_fetched_at,
+    computed_at, payload) tuples.
+    """
+    conn = get_connection()
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO dashboard_snapshots
+                (user_id, base, data_version, history_version, rates_fetched_at,
+                 computed_at, payload)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+        """, rows)
+
+
+# --------------------------------------------------
+# RATE HISTORY (dated pivot quotes)
+# --------------------------------------------------
+@traced("db")
+def store_rate_history(rows) -> int:
+    """Bulk upsert of (currency, day, per_pivot) tuples in one transaction."""
+    conn = get_connection()
+    with conn:
+        cursor = conn.executemany("""
+            INSERT OR REPLACE INTO rate_history (currency, day, per_pivot)
+            VALUES (?, ?, ?);
+        """, rows)
+    return cursor.rowcount
+
+
+@traced("db")
+def get_rate_history_version() -> int:
+    """Trigger-maintained rate_history write counter, shared by every process."""
+    row = get_connection().execute("SELECT version FROM rate_history_version;").fetchone()
+    return row["version"] if row else 0
+
+
+@traced("db")
+def iter_rate_history():
+    """Every (currency, day, per_pivot) tuple, ordered by currency then day."""
+    cursor = get_connection().cursor()
+    cursor.row_factory = None
     cursor.execute("""
-        INSERT OR REPLACE INTO settings (key, value)
-        VALUES (?, ?);
-    """, (key, value))
-    conn.commit()
-    conn.close()
+        SELECT currency, day, per_pivot FROM rate_history
+        ORDER BY currency, day;
+    """)
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
@@ -0,0 +1,162 @@
+# exporter.py
+#
+# Chunked streaming export of a user's transactions to CSV or Parquet.
+#
+#   python -m core.exporter out.csv --user alice
+#   python -m core.exporter out.parquet --user alice --base EUR
+
+import argparse
+import csv
+import sys
+import time
+from functools import partial
+from typing import Callable, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.database import get_user_row_by_username, init_db, iter_transactions_for_user
+from core.models import MINOR_PER_MAJOR
+
+BATCH_SIZE = 50_000      # rows per fetchmany() and per Parquet row group
+COLUMNS = ["id", "t_type", "amount", "currency", "category", "date", "note"]
+
+PARQUET_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("t_type", pa.string()),
+    ("amount", pa.float64()),
+    ("currency", pa.string()),
+    ("category", pa.string()),
+    ("date", pa.string()),
+    ("note", pa.string()),
+])
+
+
+def _major_amounts(batch) -> np.ndarray:
+    """Stored minor units of one batch as major-unit floats (12.34)."""
+    minor = np.fromiter((r[2] for r in batch), dtype=np.int64, count=len(batch))
+    return minor / MINOR_PER_MAJOR
+
+
+def _converted(batch, rate_for: Callable[[str], float], base: str, rates: dict) -> np.ndarray:
+    """Base-currency amounts for one batch, rounded per row like convert_to_base()."""
+    minor = np.fromiter((r[2] for r in batch), dtype=np.int64, count=len(batch))
+    currencies = [r[3] for r in batch]
+
+    for c in set(currencies):
+        if c not in rates:
+            rates[c] = 1.0 if c == base else rate_for(c)
+
+    converted = np.rint(minor * np.array([rates[c] for c in currencies]))
+    return converted / MINOR_PER_MAJOR
+
+
+def _iso_dates(batch) -> np.ndarray:
+    """Stored epoch days of one batch as "YYYY-MM-DD" strings."""
+    days = np.fromiter((r[5] for r in batch), dtype=np.int64, count=len(batch))
+    return days.astype("datetime64[D]").astype(str)
+
+
+def _with_major_amount(batch, amounts, dates):
+    return [row[:2] + (float(a),) + row[3:5] + (str(d),) + row[6:]
+            for row, a, d in zip(batch, amounts, dates)]
+
+
+def export_csv(user_id: int, out, base: Optional[str] = None,
+               rate_for: Optional[Callable[[str], float]] = None,
+               batch_size: int = BATCH_SIZE) -> int:
+    """
+    Write the user's transactions to the text stream `out` batch by batch.
+    If base and rate_for are given an extra amount_<BASE> column is added.
+    Returns the number of rows written.
+    """
+    convert = base is not None and rate_for is not None
+    rates = {}
+    writer = csv.writer(out)
+    writer.writerow(COLUMNS + ([f"amount_{base}"] if convert else []))
+
+    written = 0
+    for batch in iter_transactions_for_user(user_id, batch_size, with_note=True):
+        rows = _with_major_amount(batch, _major_amounts(batch), _iso_dates(batch))
+        if convert:
+            converted = _converted(batch, rate_for, base, rates)
+            writer.writerows(row + (float(v),) for row, v in zip(rows, converted))
+        else:
+            writer.writerows(rows)
+        written += len(batch)
+
+    return written
+
+
+def export_parquet(user_id: int, out, base: Optional[str] = None,
+                   rate_for: Optional[Callable[[str], float]] = None,
+                   batch_size: int = BATCH_SIZE) -> int:
+    """
+    Write the user's transactions to `out` (path or binary file) as Parquet,
+    one row group per batch. Same optional conversion as export_csv().
+    """
+    convert = base is not None and rate_for is not None
+    schema = PARQUET_SCHEMA.append(pa.field(f"amount_{base}", pa.float64())) if convert else PARQUET_SCHEMA
+    rates = {}
+
+    written = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for batch in iter_transactions_for_user(user_id, batch_size, with_note=True):
+            columns = [list(col) for col in zip(*batch)]
+            columns[2] = _major_amounts(batch)
+            columns[5] = _iso_dates(batch)
+            if convert:
+                columns.append(_converted(batch, rate_for, base, rates))
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            written += len(batch)
+
+    return written
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export a user's transactions")
+    parser.add_argument("out_file", help="*.csv or *.parquet")
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--base", default=None, type=str.upper,
+                        help="add an amount column converted to this currency")
+    args = parser.parse_args(argv)
+
+    init_db()
+
+    user = get_user_row_by_username(args.user)
+    if not user:
+        print(f"Unknown user: {args.user}", file=sys.stderr)
+        return 2
+
+    rate_for = None
+    if args.base:
+        from api import currency_api
+
+        if args.base not in currency_api.get_currency_list():
+            print(f"Unsupported currency: {args.base}", file=sys.stderr)
+            return 2
+        # get_rate() never blocks and falls back to 1.0 without rates, so
+        # load (or fetch) real ones first
+        if not currency_api.ensure_rate_matrix():
+            if currency_api.RATE_MATRIX is None:
+                print("Exchange rates are unavailable; cannot convert to "
+                      f"{args.base}.", file=sys.stderr)
+                return 1
+            fetched = time.strftime("%Y-%m-%d %H:%M", time.localtime(currency_api.rates_fetched_at()))
+            print(f"Warning: could not refresh rates; using those fetched {fetched}.",
+                  file=sys.stderr)
+        rate_for = partial(currency_api.get_rate, args.base)
+
+    if args.out_file.endswith(".parquet"):
+        count = export_parquet(user["id"], args.out_file, args.base, rate_for)
+    else:
+        with open(args.out_file, "w", newline="", encoding="utf-8") as f:
+            count = export_csv(user["id"], f, args.base, rate_for)
+
+    print(f"Exported {count} row(s) to {args.out_file}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
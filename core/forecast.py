@@ -0,0 +1,322 @@
+# forecast.py
+#
+# Next-month forecasts by Holt (level + trend) exponential smoothing.
+#
+# Every (user, category, type, currency) monthly series is smoothed in
+# native minor units, so a base-currency change only re-weights the
+# forecasts. forecast_state keeps each series' level/trend after folding
+# all months up to `month`, one month before the user's latest. Writes to
+# the latest month therefore cost nothing here (the aggregate triggers
+# already keep its sums); that month is folded in memory on each read.
+# The state trigger (core/migrations.py, step 12) marks a series stale
+# when a write lands on a month already folded, and stale users are refit
+# from their aggregates on the next read.
+#
+#   python -m core.forecast rebuild [--user ID]   # batch-fit all users
+#   python -m core.forecast show --user ID
+
+import argparse
+import sys
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.database import get_connection, init_db
+from core.models import month_key, to_major
+from core.tracing import traced
+
+ALPHA = 0.5     # level smoothing: weight of the newest month
+BETA = 0.3      # trend smoothing
+CHUNK_KEYS = 50_000     # series fitted per NumPy block in rebuild()
+
+KEY_COLUMNS = ["user_id", "category", "t_type", "currency"]
+
+
+# --------------------------------------------------
+# Holt smoothing over arrays of series
+# --------------------------------------------------
+def holt_step(level: np.ndarray, trend: np.ndarray, observed: np.ndarray,
+              y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fold one month's sums y into every series. A series starts (level = y,
+    trend = 0) at its first non-zero month; months before that are skipped.
+    """
+    started = observed > 0
+    first = ~started & (y != 0)
+
+    new_level = ALPHA * y + (1 - ALPHA) * (level + trend)
+    new_trend = BETA * (new_level - level) + (1 - BETA) * trend
+
+    level = np.where(started, new_level, np.where(first, y, level))
+    trend = np.where(started, new_trend, 0.0)
+    return level, trend, observed + (started | first)
+
+
+def fit_series(values: np.ndarray, level=None, trend=None, observed=None):
+    """
+    values[k, t] = month t's sum of series k (consecutive months, 0 where
+    there were no rows). Folds the columns left to right, all series at
+    once, optionally continuing from existing state.
+    """
+    n = values.shape[0]
+    level = np.zeros(n) if level is None else np.asarray(level, dtype=np.float64)
+    trend = np.zeros(n) if trend is None else np.asarray(trend, dtype=np.float64)
+    observed = (np.zeros(n, dtype=np.int64) if observed is None
+                else np.asarray(observed, dtype=np.int64))
+
+    for t in range(values.shape[1]):
+        level, trend, observed = holt_step(level, trend, observed, values[:, t])
+    return level, trend, observed
+
+
+def next_value(level: np.ndarray, trend: np.ndarray, observed: np.ndarray) -> np.ndarray:
+    """One-month-ahead forecast; 0 for series that never started."""
+    return np.where(observed > 0, level + trend, 0.0)
+
+
+# --------------------------------------------------
+# Batch fit (all users, or one) from the aggregates
+# --------------------------------------------------
+def _read_aggregates(conn, user_id: Optional[int]) -> pd.DataFrame:
+    where = "" if user_id is None else "WHERE user_id = ?"
+    params = () if user_id is None else (user_id,)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(f"""
+        SELECT user_id, category, t_type, currency, month, amount_minor_sum
+        FROM transaction_aggregates
+        {where};
+    """, params).fetchall()
+    return pd.DataFrame(rows, columns=KEY_COLUMNS + ["month", "amount"])
+
+
+def _fit_frame(frame: pd.DataFrame) -> List[tuple]:
+    """forecast_state rows for every series in `frame` (aggregate rows)."""
+    if frame.empty:
+        return []
+
+    # each user's series end one month before that user's latest month
+    latest = frame.groupby("user_id")["month"].transform("max").to_numpy(np.int64)
+    frame = frame.assign(latest=latest)
+    key_codes = frame.groupby(KEY_COLUMNS, sort=False).ngroup().to_numpy()
+    keys = frame.drop_duplicates(KEY_COLUMNS)[KEY_COLUMNS + ["latest"]].to_numpy()
+
+    states = []
+    for lo in range(0, len(keys), CHUNK_KEYS):
+        hi = min(lo + CHUNK_KEYS, len(keys))
+        in_chunk = (key_codes >= lo) & (key_codes < hi)
+        folded = in_chunk & (frame["month"].to_numpy() < latest)
+
+        # right-aligned: the last column is every series' latest - 1
+        back = latest[folded] - frame["month"].to_numpy()[folded]    # 1 = latest - 1
+        width = int(back.max()) if back.size else 0
+        values = np.zeros((hi - lo, width))
+        np.add.at(values, (key_codes[folded] - lo, width - back),
+                  frame["amount"].to_numpy(np.float64)[folded])
+
+        level, trend, observed = fit_series(values)
+        for (user_id, category, t_type, currency, last), l, tr, n in zip(
+                keys[lo:hi], level, trend, observed):
+            states.append((int(user_id), category, t_type, currency, int(last) - 1,
+                           float(l), float(tr), int(n)))
+    return states
+
+
+def _write_states(conn, states: List[tuple], user_id: Optional[int]):
+    where = "" if user_id is None else "WHERE user_id = ?"
+    params = () if user_id is None else (user_id,)
+    conn.execute(f"DELETE FROM forecast_state {where};", params)
+    conn.executemany("""
+        INSERT INTO forecast_state
+            (user_id, category, t_type, currency, month, level, trend, observed, stale)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0);
+    """, states)
+
+
+@traced("analytics")
+def rebuild(user_id: Optional[int] = None) -> int:
+    """
+    Refit every series (all users, or one) from transaction_aggregates in
+    one write transaction; returns the number of series.
+    """
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        states = _fit_frame(_read_aggregates(conn, user_id))
+        _write_states(conn, states, user_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(states)
+
+
+# --------------------------------------------------
+# Per-user read
+# --------------------------------------------------
+def _latest_month(conn, user_id: int) -> Optional[int]:
+    row = conn.execute("""
+        SELECT MAX(month) AS m FROM transaction_aggregates
+        WHERE user_id = ?;
+    """, (user_id,)).fetchone()
+    return row["m"]
+
+
+def _read_states(conn, user_id: int) -> List[tuple]:
+    """(category, t_type, currency, month, level, trend, observed, stale) rows."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute("""
+        SELECT category, t_type, currency, month, level, trend, observed, stale
+        FROM forecast_state
+        WHERE user_id = ?;
+    """, (user_id,)).fetchall()
+
+
+def _sum_matrix(conn, user_id: int, states: List[tuple], first: int, last: int) -> np.ndarray:
+    """values[k, t]: the states' series over months first..last, from the aggregates."""
+    values = np.zeros((len(states), last - first + 1))
+    index = {s[:3]: k for k, s in enumerate(states)}
+
+    for category, t_type, currency, month, amount in conn.execute("""
+        SELECT category, t_type, currency, month, amount_minor_sum
+        FROM transaction_aggregates
+        WHERE user_id = ? AND month BETWEEN ? AND ?;
+    """, (user_id, first, last)):
+        k = index.get((category, t_type, currency))
+        if k is not None:
+            values[k, month - first] += amount
+    return values
+
+
+def _state_arrays(states: List[tuple]):
+    """level, trend, observed arrays of the state rows."""
+    return (np.array([s[4] for s in states], dtype=np.float64),
+            np.array([s[5] for s in states], dtype=np.float64),
+            np.array([s[6] for s in states], dtype=np.int64))
+
+
+def _current_states(user_id: int, latest: int, persist: bool = True) -> List[tuple]:
+    """
+    The user's state rows folded through latest - 1: refit if anything is
+    stale, otherwise advanced over any months the user has moved on since.
+    With persist=False nothing is written: out-of-date state is refit in
+    memory only (for read-only workers).
+    """
+    conn = get_connection()
+    states = _read_states(conn, user_id)
+    if states and all(not s[7] and s[3] == latest - 1 for s in states):
+        return states
+
+    if not persist:
+        return [s[1:] + (0,) for s in _fit_frame(_read_aggregates(conn, user_id))]
+
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        states = _read_states(conn, user_id)
+        months = {s[3] for s in states}
+
+        if not states or any(s[7] for s in states) or len(months) != 1 or min(months) >= latest:
+            _write_states(conn, _fit_frame(_read_aggregates(conn, user_id)), user_id)
+        elif min(months) < latest - 1:
+            first = min(months) + 1
+            level, trend, observed = fit_series(
+                _sum_matrix(conn, user_id, states, first, latest - 1), *_state_arrays(states)
+            )
+            conn.executemany("""
+                UPDATE forecast_state
+                SET month = ?, level = ?, trend = ?, observed = ?
+                WHERE user_id = ? AND category = ? AND t_type = ? AND currency = ?;
+            """, [
+                (latest - 1, float(l), float(tr), int(n), user_id, *s[:3])
+                for s, l, tr, n in zip(states, level, trend, observed)
+            ])
+
+        states = _read_states(conn, user_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return states
+
+
+@traced("analytics")
+def forecast_for_user(user_id: int, rate_for: Callable[[str], float], base: str,
+                      persist: bool = True) -> dict:
+    """
+    Next month's forecast in `base`, from the stored state plus the
+    latest month's sums (out-of-date state is refit and, if persist,
+    stored):
+    {
+        "month":    "2025-04",
+        "net":      123.45,
+        "category": [{"category": "Food", "type": "Expense", "amount": 80.0}, ...],
+    }
+    Category forecasts are never negative; "net" is income minus expense
+    over them. Largest categories first.
+    """
+    conn = get_connection()
+    latest = _latest_month(conn, user_id)
+    if latest is None:
+        return {"month": None, "net": 0.0, "category": []}
+
+    states = _current_states(user_id, latest, persist)
+    level, trend, observed = holt_step(
+        *_state_arrays(states), _sum_matrix(conn, user_id, states, latest, latest)[:, 0]
+    )
+    forecasts = next_value(level, trend, observed)
+
+    rates = {}
+    per_category = {}
+    for (category, t_type, currency, *_), value in zip(states, forecasts.tolist()):
+        if currency not in rates:
+            rates[currency] = 1.0 if currency == base else rate_for(currency)
+        key = (category, t_type)
+        per_category[key] = per_category.get(key, 0.0) + value * rates[currency]
+
+    rows = sorted(
+        ((c, t, round(v)) for (c, t), v in per_category.items() if round(v) > 0),
+        key=lambda row: row[2], reverse=True,
+    )
+    income = sum(a for _c, t, a in rows if t == "Income")
+    expense = sum(a for _c, t, a in rows if t != "Income")
+
+    return {
+        "month": month_key(latest + 1),
+        "net": to_major(income - expense),
+        "category": [{"category": c, "type": t, "amount": to_major(a)} for c, t, a in rows],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain forecast_state")
+    parser.add_argument("command", choices=["rebuild", "show"])
+    parser.add_argument("--user", type=int, default=None, help="limit to one user id")
+    args = parser.parse_args(argv)
+
+    init_db()
+
+    if args.command == "rebuild":
+        count = rebuild(args.user)
+        print(f"Fitted {count} series.")
+        return 0
+
+    if args.user is None:
+        parser.error("show needs --user")
+
+    # native units (no conversion); each line is one currency's forecast
+    conn = get_connection()
+    latest = _latest_month(conn, args.user)
+    if latest is None:
+        print("No transactions.")
+        return 0
+    for category, t_type, currency, month, level, trend, *_ in _current_states(args.user, latest):
+        print(f"{category} / {t_type} / {currency}: "
+              f"level={to_major(round(level))} trend={to_major(round(trend))} "
+              f"through {month_key(month)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
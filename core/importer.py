@@ -0,0 +1,195 @@
+# importer.py
+#
+# Streaming bulk import of transactions from CSV.
+#
+#   python -m core.importer transactions.csv --user alice
+#
+# Expected header (order free, extra columns ignored):
+#   t_type (or type), amount, currency, category, date (YYYY-MM-DD)
+# plus an optional note column.
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from api.currency_api import get_currency_list
+from core.database import get_connection, get_user_row_by_username, init_db
+from core.migrations import index_transactions_after
+from core.models import MAX_AMOUNT_MINOR, MAX_NOTE_LENGTH, MINOR_PER_MAJOR, to_major
+
+CHUNK_SIZE = 50_000
+MAX_REPORTED_ERRORS = 1_000      # keep the report small for huge bad files
+REQUIRED_COLUMNS = ["t_type", "amount", "currency", "category", "date"]
+COLUMN_ALIASES = {"type": "t_type"}
+VALID_TYPES = ["Income", "Expense"]
+EPOCH = pd.Timestamp("1970-01-01")     # stored dates are days since this
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    rejected: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)  # (csv line, message)
+    seconds: float = 0.0
+
+    def add_error(self, line: int, message: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+class ImportFormatError(Exception):
+    """The file itself cannot be imported (e.g. missing columns)."""
+    pass
+
+
+# --------------------------------------------------
+# Vectorized validation (mirrors Transaction.validate_*)
+# --------------------------------------------------
+def _validate_chunk(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Returns (clean rows, per-row error message or "" for valid rows).
+    Each check is the column-wise equivalent of one Transaction.validate_*
+    method and reports the same message.
+    """
+    errors = pd.Series("", index=chunk.index, dtype=object)
+
+    def flag(mask, messages):
+        mask = mask & (errors == "")   # report the first problem per row
+        errors[mask] = messages[mask] if isinstance(messages, pd.Series) else messages
+
+    t_type = chunk["t_type"].str.strip()
+    currency = chunk["currency"].str.strip().str.upper()
+    category = chunk["category"].str.strip()
+    amount = pd.to_numeric(chunk["amount"].str.strip(), errors="coerce")
+    amount_minor = (amount * MINOR_PER_MAJOR).round()
+    date = pd.to_datetime(chunk["date"].str.strip(), format="%Y-%m-%d", errors="coerce")
+    note = chunk["note"].str.strip() if "note" in chunk.columns else pd.Series("", index=chunk.index)
+
+    # validate_type
+    flag(~t_type.isin(VALID_TYPES), "Invalid transaction type: " + chunk["t_type"])
+    # validate_amount
+    flag(~np.isfinite(amount), "Amount must be a number.")    # also "inf", "nan"
+    flag(~(amount_minor > 0), "Amount must be greater than zero.")
+    # checked before the int64 cast, which would fail or wrap around
+    flag(amount_minor > MAX_AMOUNT_MINOR,
+         f"Amount cannot be more than {to_major(MAX_AMOUNT_MINOR):,.0f}.")
+    # currency (required by the schema; only rated currencies can be shown)
+    flag(currency == "", "Currency cannot be empty.")
+    flag(~currency.isin(get_currency_list()), "Unsupported currency: " + chunk["currency"])
+    # validate_category
+    flag(category == "", "Category cannot be empty.")
+    # validate_date
+    flag(date.isna(), "Date must be in YYYY-MM-DD format.")
+    # validate_note
+    flag(note.str.len() > MAX_NOTE_LENGTH, f"Note cannot be longer than {MAX_NOTE_LENGTH} characters.")
+
+    valid = errors == ""
+    clean = pd.DataFrame({
+        "t_type": t_type[valid],
+        "amount_minor": amount_minor[valid].astype(np.int64),
+        "currency": currency[valid],
+        "category": category[valid],
+        "day": (date[valid] - EPOCH).dt.days.astype(np.int64),
+        "note": note[valid],
+    })
+    return clean, errors
+
+
+def _read_chunks(source, chunk_size: int):
+    reader = pd.read_csv(
+        source,
+        dtype=str,
+        keep_default_na=False,
+        skipinitialspace=True,
+        chunksize=chunk_size,
+    )
+
+    for chunk in reader:
+        chunk = chunk.rename(columns=lambda c: COLUMN_ALIASES.get(c.strip().lower(), c.strip().lower()))
+        missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+        if missing:
+            raise ImportFormatError(f"Missing column(s): {', '.join(missing)}")
+        yield chunk
+
+
+# --------------------------------------------------
+# Import
+# --------------------------------------------------
+def import_csv(source, user_id: int, chunk_size: int = CHUNK_SIZE) -> ImportReport:
+    """
+    Stream `source` (path or file-like) into the user's transactions.
+    Each chunk is validated column-wise and written with one executemany
+    inside one transaction; invalid rows are reported, not fatal.
+    Memory use is bounded by chunk_size, not by file size.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    conn = get_connection()
+
+    for chunk in _read_chunks(source, chunk_size):
+        clean, errors = _validate_chunk(chunk)
+
+        for index, message in errors[errors != ""].items():
+            report.add_error(int(index) + 2, message)   # +1 header, +1 one-based
+
+        if clean.empty:
+            continue
+
+        clean["user_id"] = user_id
+        with conn:
+            # search triggers off for this transaction; the chunk is
+            # indexed in two set-based statements after the insert
+            conn.execute("INSERT INTO search_index_deferred (id) VALUES (1);")
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions;").fetchone()[0]
+            conn.executemany("""
+                INSERT INTO transactions (t_type, amount_minor, currency, category, day, note, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, clean[["t_type", "amount_minor", "currency", "category", "day", "note", "user_id"]]
+                .itertuples(index=False, name=None))
+            index_transactions_after(conn.cursor(), user_id, last_id)
+            conn.execute("DELETE FROM search_index_deferred;")
+
+        report.imported += len(clean)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import transactions from CSV")
+    parser.add_argument("csv_file")
+    parser.add_argument("--user", required=True, help="username that will own the rows")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    init_db()
+
+    user = get_user_row_by_username(args.user)
+    if not user:
+        print(f"Unknown user: {args.user}", file=sys.stderr)
+        return 2
+
+    try:
+        report = import_csv(args.csv_file, user["id"], args.chunk_size)
+    except ImportFormatError as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 2
+
+    for line, message in report.errors:
+        print(f"line {line}: {message}", file=sys.stderr)
+    if report.rejected > len(report.errors):
+        print(f"... and {report.rejected - len(report.errors)} more errors", file=sys.stderr)
+
+    print(f"Imported {report.imported} row(s), rejected {report.rejected}, "
+          f"in {report.seconds:.1f}s.")
+    return 0 if report.rejected == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,917 @@
+# migrations.py
+
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+
+# --------------------------------------------------
+# Migration registry
+# --------------------------------------------------
+# Each step is (version, description, function(cursor)). Steps run in
+# version order inside one write transaction each, and every statement is
+# written so that re-running a step on an already-migrated database is a
+# no-op. Append new steps at the end; never renumber old ones.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = []
+
+
+def migration(version: int, description: str):
+    """Decorator registering a schema migration step."""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def _table_columns(cursor: sqlite3.Cursor, table: str) -> List[sqlite3.Row]:
+    return cursor.execute(f"PRAGMA table_info({table});").fetchall()
+
+
+# --------------------------------------------------
+# 1: original tables
+# --------------------------------------------------
+@migration(1, "create users, transactions and settings tables")
+def _create_base_tables(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            t_type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            currency TEXT NOT NULL,
+            category TEXT NOT NULL,
+            date TEXT NOT NULL,
+            user_id INTEGER
+        );
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """)
+
+
+# --------------------------------------------------
+# 2: owner constraints + per-user indexes
+# --------------------------------------------------
+@migration(2, "require transactions.user_id, reference users, index by user")
+def _constrain_and_index_transactions(cursor: sqlite3.Cursor):
+    columns = {c["name"]: c for c in _table_columns(cursor, "transactions")}
+
+    # SQLite cannot add NOT NULL / REFERENCES to an existing column, so the
+    # table is rebuilt once. Rows without a valid owner were never visible
+    # to anyone (every query filters on user_id); they are parked in
+    # transactions_orphaned instead of being dropped.
+    if not columns["user_id"]["notnull"]:
+        cursor.execute("""
+            CREATE TABLE transactions_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                t_type TEXT NOT NULL,
+                amount REAL NOT NULL,
+                currency TEXT NOT NULL,
+                category TEXT NOT NULL,
+                date TEXT NOT NULL,
+                user_id INTEGER NOT NULL
+                    REFERENCES users(id) ON DELETE CASCADE
+            );
+        """)
+
+        cursor.execute("""
+            INSERT INTO transactions_new
+                (id, t_type, amount, currency, category, date, user_id)
+            SELECT id, t_type, amount, currency, category, date, user_id
+            FROM transactions
+            WHERE user_id IN (SELECT id FROM users);
+        """)
+
+        orphaned = cursor.execute("""
+            SELECT COUNT(*) FROM transactions
+            WHERE user_id IS NULL OR user_id NOT IN (SELECT id FROM users);
+        """).fetchone()[0]
+
+        if orphaned:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS transactions_orphaned AS
+                SELECT * FROM transactions WHERE 0;
+            """)
+            cursor.execute("""
+                INSERT INTO transactions_orphaned
+                SELECT * FROM transactions
+                WHERE user_id IS NULL OR user_id NOT IN (SELECT id FROM users);
+            """)
+
+        cursor.execute("DROP TABLE transactions;")
+        cursor.execute("ALTER TABLE transactions_new RENAME TO transactions;")
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+        ON transactions (user_id, date);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_category
+        ON transactions (user_id, category);
+    """)
+
+
+# --------------------------------------------------
+# 3: materialized per-user aggregates
+# --------------------------------------------------
+# One row per (user, month, category, type, currency) holding the native
+# currency sum and row count, kept current by triggers so every write path
+# (single, bulk, or raw SQL) maintains it. first_id is the smallest
+# transaction id in the group; it preserves "first seen" ordering.
+#
+# The trigger bodies are templates over the column layout, because later
+# migrations change how amounts and dates are stored: `amount` is the
+# transactions column, `total` the aggregates column summing it, and
+# `month` the month-key expression for a transactions row `{r}`.
+_V3_MONTH = "substr({r}.date, 1, 7)"
+
+_AGGREGATE_KEY_MATCH = """
+    user_id = {r}.user_id AND month = {month}
+    AND category = {r}.category AND t_type = {r}.t_type
+    AND currency = {r}.currency
+"""
+
+_AGGREGATE_ADD = """
+    INSERT INTO transaction_aggregates
+        (user_id, month, category, t_type, currency, {total}, row_count, first_id)
+    VALUES (NEW.user_id, {new_month}, NEW.category, NEW.t_type,
+            NEW.currency, NEW.{amount}, 1, NEW.id)
+    ON CONFLICT (user_id, month, category, t_type, currency) DO UPDATE SET
+        {total} = {total} + excluded.{total},
+        row_count = row_count + 1,
+        first_id = MIN(first_id, excluded.first_id);
+"""
+
+_AGGREGATE_REMOVE = """
+    UPDATE transaction_aggregates
+    SET {total} = {total} - OLD.{amount},
+        row_count = row_count - 1
+    WHERE {match};
+
+    DELETE FROM transaction_aggregates
+    WHERE {match} AND row_count <= 0;
+
+    UPDATE transaction_aggregates
+    SET first_id = (
+        SELECT MIN(id) FROM transactions
+        WHERE user_id = OLD.user_id AND category = OLD.category
+          AND t_type = OLD.t_type AND currency = OLD.currency
+          AND {row_month} = {old_month}
+    )
+    WHERE {match} AND first_id = OLD.id;
+"""
+
+
+def _create_aggregate_triggers(cursor: sqlite3.Cursor, amount: str, total: str, month: str,
+                               date: str = "date"):
+    old_month = month.format(r="OLD")
+    add = _AGGREGATE_ADD.format(amount=amount, total=total, new_month=month.format(r="NEW"))
+    remove = _AGGREGATE_REMOVE.format(
+        amount=amount, total=total,
+        match=_AGGREGATE_KEY_MATCH.format(r="OLD", month=old_month),
+        row_month=month.format(r="transactions"), old_month=old_month,
+    )
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_agg_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            {add}
+        END;
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_agg_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            {remove}
+        END;
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_agg_update
+        AFTER UPDATE OF t_type, {amount}, currency, category, {date}, user_id
+        ON transactions
+        BEGIN
+            {remove}
+            {add}
+        END;
+    """)
+
+
+def _fill_aggregates(cursor: sqlite3.Cursor, amount: str, total: str, month: str,
+                     user_id: int = None):
+    where = "" if user_id is None else "WHERE user_id = ?"
+    params = () if user_id is None else (user_id,)
+    month = month.format(r="transactions")
+
+    cursor.execute(f"DELETE FROM transaction_aggregates {where};", params)
+    cursor.execute(f"""
+        INSERT INTO transaction_aggregates
+            (user_id, month, category, t_type, currency, {total}, row_count, first_id)
+        SELECT user_id, {month}, category, t_type, currency,
+               SUM({amount}), COUNT(*), MIN(id)
+        FROM transactions
+        {where}
+        GROUP BY user_id, {month}, category, t_type, currency;
+    """, params)
+
+
+@migration(3, "add transaction_aggregates table maintained by triggers")
+def _create_transaction_aggregates(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_aggregates (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            t_type TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            amount_sum REAL NOT NULL,
+            row_count INTEGER NOT NULL,
+            first_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month, category, t_type, currency)
+        ) WITHOUT ROWID;
+    """)
+
+    _create_aggregate_triggers(cursor, amount="amount", total="amount_sum", month=_V3_MONTH)
+    _fill_aggregates(cursor, amount="amount", total="amount_sum", month=_V3_MONTH)
+
+
+def rebuild_aggregates(cursor: sqlite3.Cursor, user_id: int = None):
+    """Recompute transaction_aggregates from raw rows (all users or one)."""
+    _fill_aggregates(cursor, amount="amount_minor", total="amount_minor_sum",
+                     month="{r}.month", user_id=user_id)
+
+
+# --------------------------------------------------
+# 4: persistent exchange-rate cache
+# --------------------------------------------------
+@migration(4, "add exchange_rates cache table")
+def _create_exchange_rates(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS exchange_rates (
+            base TEXT NOT NULL,
+            quote TEXT NOT NULL,
+            rate REAL NOT NULL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (base, quote)
+        ) WITHOUT ROWID;
+    """)
+
+
+# --------------------------------------------------
+# 5: per-user settings
+# --------------------------------------------------
+@migration(5, "add user_settings table")
+def _create_user_settings(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_settings (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (user_id, key)
+        ) WITHOUT ROWID;
+    """)
+
+
+# --------------------------------------------------
+# 6: id-ordered per-user index for keyset pagination
+# --------------------------------------------------
+@migration(6, "index transactions by (user_id, id)")
+def _index_transactions_by_user_id(cursor: sqlite3.Cursor):
+    # The rowid is implicitly the last key column, so this is (user_id, id)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user
+        ON transactions (user_id);
+    """)
+
+
+# --------------------------------------------------
+# 7: per-user password hash parameters
+# --------------------------------------------------
+@migration(7, "record password hash parameters per user")
+def _add_user_hash_params(cursor: sqlite3.Cursor):
+    # Existing hashes were all made with the original fixed parameters
+    columns = {col["name"] for col in _table_columns(cursor, "users")}
+    if "hash_params" not in columns:
+        cursor.execute("""
+            ALTER TABLE users
+            ADD COLUMN hash_params TEXT NOT NULL DEFAULT 'pbkdf2_sha256$100000';
+        """)
+
+
+# --------------------------------------------------
+# 8: login sessions
+# --------------------------------------------------
+@migration(8, "add sessions table")
+def _create_sessions(cursor: sqlite3.Cursor):
+    # token_hash = sha256 of the token's random part; the token itself is
+    # never stored.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_user
+        ON sessions (user_id);
+    """)
+
+
+# --------------------------------------------------
+# 9: integer minor units
+# --------------------------------------------------
+@migration(9, "store amounts as integer minor units")
+def _store_amounts_in_minor_units(cursor: sqlite3.Cursor):
+    columns = {c["name"] for c in _table_columns(cursor, "transactions")}
+
+    # SQLite cannot change a column's type, so the table is rebuilt (its
+    # indexes and triggers go with it and are recreated below).
+    if "amount_minor" not in columns:
+        cursor.execute("""
+            CREATE TABLE transactions_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                t_type TEXT NOT NULL,
+                amount_minor INTEGER NOT NULL,
+                currency TEXT NOT NULL,
+                category TEXT NOT NULL,
+                date TEXT NOT NULL,
+                user_id INTEGER NOT NULL
+                    REFERENCES users(id) ON DELETE CASCADE
+            );
+        """)
+
+        cursor.execute("""
+            INSERT INTO transactions_new
+                (id, t_type, amount_minor, currency, category, date, user_id)
+            SELECT id, t_type, CAST(ROUND(amount * 100) AS INTEGER),
+                   currency, category, date, user_id
+            FROM transactions;
+        """)
+
+        cursor.execute("DROP TABLE transactions;")
+        cursor.execute("ALTER TABLE transactions_new RENAME TO transactions;")
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+        ON transactions (user_id, date);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_category
+        ON transactions (user_id, category);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user
+        ON transactions (user_id);
+    """)
+
+    # Integer sums are exact, so the aggregates switch to minor units too
+    cursor.execute("DROP TABLE IF EXISTS transaction_aggregates;")
+    cursor.execute("""
+        CREATE TABLE transaction_aggregates (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            t_type TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            amount_minor_sum INTEGER NOT NULL,
+            row_count INTEGER NOT NULL,
+            first_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month, category, t_type, currency)
+        ) WITHOUT ROWID;
+    """)
+
+    _create_aggregate_triggers(cursor, amount="amount_minor", total="amount_minor_sum", month=_V3_MONTH)
+    _fill_aggregates(cursor, amount="amount_minor", total="amount_minor_sum", month=_V3_MONTH)
+
+
+# --------------------------------------------------
+# 10: integer epoch-day dates
+# --------------------------------------------------
+# `day` = days since 1970-01-01, so date ranges are integer comparisons on
+# the (user_id, day) index. `month` = months since 1970-01, a virtual
+# generated column the aggregates group by.
+_MONTH_FROM_DAY = """
+    (CAST(strftime('%Y', day * 86400, 'unixepoch') AS INTEGER) - 1970) * 12
+    + CAST(strftime('%m', day * 86400, 'unixepoch') AS INTEGER) - 1
+"""
+
+
+@migration(10, "store transaction dates as epoch days")
+def _store_dates_as_epoch_days(cursor: sqlite3.Cursor):
+    columns = {c["name"] for c in _table_columns(cursor, "transactions")}
+
+    if "day" not in columns:
+        cursor.execute(f"""
+            CREATE TABLE transactions_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                t_type TEXT NOT NULL,
+                amount_minor INTEGER NOT NULL,
+                currency TEXT NOT NULL,
+                category TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                user_id INTEGER NOT NULL
+                    REFERENCES users(id) ON DELETE CASCADE,
+                month INTEGER GENERATED ALWAYS AS ({_MONTH_FROM_DAY}) VIRTUAL
+            );
+        """)
+
+        cursor.execute("""
+            INSERT INTO transactions_new
+                (id, t_type, amount_minor, currency, category, day, user_id)
+            SELECT id, t_type, amount_minor, currency, category,
+                   CAST(julianday(date) - julianday('1970-01-01') AS INTEGER), user_id
+            FROM transactions;
+        """)
+
+        cursor.execute("DROP TABLE transactions;")
+        cursor.execute("ALTER TABLE transactions_new RENAME TO transactions;")
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_day
+        ON transactions (user_id, day);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_category
+        ON transactions (user_id, category);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user
+        ON transactions (user_id);
+    """)
+
+    cursor.execute("DROP TABLE IF EXISTS transaction_aggregates;")
+    cursor.execute("""
+        CREATE TABLE transaction_aggregates (
+            user_id INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            t_type TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            amount_minor_sum INTEGER NOT NULL,
+            row_count INTEGER NOT NULL,
+            first_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month, category, t_type, currency)
+        ) WITHOUT ROWID;
+    """)
+
+    # the update trigger now watches `day` (the `date` column is gone)
+    cursor.execute("DROP TRIGGER IF EXISTS trg_transactions_agg_update;")
+    _create_aggregate_triggers(cursor, amount="amount_minor", total="amount_minor_sum",
+                               month="{r}.month", date="day")
+    _fill_aggregates(cursor, amount="amount_minor", total="amount_minor_sum", month="{r}.month")
+
+
+# --------------------------------------------------
+# 11: dated exchange rates
+# --------------------------------------------------
+@migration(11, "add rate_history table")
+def _create_rate_history(cursor: sqlite3.Cursor):
+    # per_pivot = units of `currency` per 1 pivot currency (USD) on `day`
+    # (epoch day), the same quote format exchange_rates stores.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rate_history (
+            currency TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            per_pivot REAL NOT NULL,
+            PRIMARY KEY (currency, day)
+        ) WITHOUT ROWID;
+    """)
+
+
+# --------------------------------------------------
+# 12: forecast state
+# --------------------------------------------------
+# One row per (user, category, type, currency) series: Holt level/trend
+# after folding every month up to `month` (see core/forecast.py). Writes
+# to later months leave it alone; a write landing on an already folded
+# month, or a series without a row yet, marks the row stale so the
+# user's series are refit on the next read.
+_FORECAST_MARK_STALE = """
+    INSERT INTO forecast_state
+        (user_id, category, t_type, currency, month, level, trend, observed, stale)
+    VALUES ({r}.user_id, {r}.category, {r}.t_type, {r}.currency, {r}.month, 0, 0, 0, 1)
+    ON CONFLICT (user_id, category, t_type, currency) DO UPDATE SET stale = 1
+    WHERE forecast_state.month >= excluded.month;
+"""
+
+
+@migration(12, "add forecast_state table, fix aggregate update trigger")
+def _create_forecast_state(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_state (
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            t_type TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            month INTEGER NOT NULL,
+            level REAL NOT NULL,
+            trend REAL NOT NULL,
+            observed INTEGER NOT NULL,
+            stale INTEGER NOT NULL,
+            PRIMARY KEY (user_id, category, t_type, currency)
+        ) WITHOUT ROWID;
+    """)
+
+    new, old = _FORECAST_MARK_STALE.format(r="NEW"), _FORECAST_MARK_STALE.format(r="OLD")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_forecast_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            {new}
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_forecast_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            {old}
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_forecast_update
+        AFTER UPDATE OF t_type, amount_minor, currency, category, day, user_id
+        ON transactions
+        BEGIN
+            {old}
+            {new}
+        END;
+    """)
+
+    # databases migrated by an earlier migration 10 kept a trigger watching
+    # `date`; recreating it is a no-op for the others
+    cursor.execute("DROP TRIGGER IF EXISTS trg_transactions_agg_update;")
+    _create_aggregate_triggers(cursor, amount="amount_minor", total="amount_minor_sum",
+                               month="{r}.month", date="day")
+
+
+# --------------------------------------------------
+# 13: persistent data versions and stored dashboards
+# --------------------------------------------------
+# user_data_versions counts every write to a user's transactions (by
+# trigger, so bulk and raw SQL writes count too). Unlike the in-process
+# counters in core/database.py it is shared by every process, so a
+# dashboard snapshot computed elsewhere can tell whether it is current.
+_DATA_VERSION_BUMP = """
+    INSERT INTO user_data_versions (user_id, version) VALUES ({r}.user_id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+"""
+
+
+@migration(13, "add user_data_versions and dashboard_snapshots tables")
+def _create_dashboard_snapshots(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_data_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_snapshots (
+            user_id INTEGER PRIMARY KEY,
+            base TEXT NOT NULL,
+            data_version INTEGER NOT NULL,
+            rates_fetched_at REAL NOT NULL,
+            computed_at REAL NOT NULL,
+            payload TEXT NOT NULL
+        );
+    """)
+
+    new, old = _DATA_VERSION_BUMP.format(r="NEW"), _DATA_VERSION_BUMP.format(r="OLD")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_version_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            {new}
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_version_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            {old}
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_version_update
+        AFTER UPDATE ON transactions
+        BEGIN
+            {old}
+            {new}
+        END;
+    """)
+
+
+# --------------------------------------------------
+# 14: notes and full-text search
+# --------------------------------------------------
+# transactions_fts indexes category and note of every transaction, plus an
+# `owner` token ("u<user_id>") so a query only ever matches one user's
+# rows. It is contentless (content=''): rows are found by rowid (= the
+# transaction id) and nothing is stored twice. Contentless rows are
+# removed with the 'delete' command and their original values, which the
+# triggers take from OLD.
+#
+# user_categories keeps each user's distinct categories with a usage
+# count (by trigger, like the aggregates) and category_fts indexes them
+# for autocomplete, so suggestions never scan transactions.
+_FTS_ADD = """
+    INSERT INTO transactions_fts (rowid, owner, category, note)
+    VALUES (NEW.id, 'u' || NEW.user_id, NEW.category, NEW.note);
+"""
+
+_FTS_REMOVE = """
+    INSERT INTO transactions_fts (transactions_fts, rowid, owner, category, note)
+    VALUES ('delete', OLD.id, 'u' || OLD.user_id, OLD.category, OLD.note);
+"""
+
+_CATEGORY_ADD = """
+    INSERT INTO user_categories (user_id, category, row_count)
+    VALUES (NEW.user_id, NEW.category, 1)
+    ON CONFLICT (user_id, category) DO UPDATE SET row_count = row_count + 1;
+"""
+
+_CATEGORY_REMOVE = """
+    UPDATE user_categories SET row_count = row_count - 1
+    WHERE user_id = OLD.user_id AND category = OLD.category;
+
+    DELETE FROM user_categories
+    WHERE user_id = OLD.user_id AND category = OLD.category AND row_count <= 0;
+"""
+
+
+def fill_search_index(cursor: sqlite3.Cursor):
+    """(Re)build both full-text indexes and user_categories from transactions."""
+    cursor.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('delete-all');")
+    cursor.execute("""
+        INSERT INTO transactions_fts (rowid, owner, category, note)
+        SELECT id, 'u' || user_id, category, note FROM transactions;
+    """)
+
+    cursor.execute("DELETE FROM user_categories;")
+    cursor.execute("INSERT INTO category_fts (category_fts) VALUES ('delete-all');")
+    cursor.execute("""
+        INSERT INTO user_categories (user_id, category, row_count)
+        SELECT user_id, category, COUNT(*) FROM transactions
+        GROUP BY user_id, category;
+    """)
+
+
+@migration(14, "add transaction notes and full-text search indexes")
+def _create_search_index(cursor: sqlite3.Cursor):
+    columns = {c["name"] for c in _table_columns(cursor, "transactions")}
+    if "note" not in columns:
+        cursor.execute("ALTER TABLE transactions ADD COLUMN note TEXT NOT NULL DEFAULT '';")
+
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+            owner, category, note,
+            content='', prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_categories (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            UNIQUE (user_id, category)
+        );
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS category_fts USING fts5(
+            owner, category,
+            content='', prefix='1 2 3', tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_categories_fts_insert
+        AFTER INSERT ON user_categories
+        BEGIN
+            INSERT INTO category_fts (rowid, owner, category)
+            VALUES (NEW.id, 'u' || NEW.user_id, NEW.category);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_categories_fts_delete
+        AFTER DELETE ON user_categories
+        BEGIN
+            INSERT INTO category_fts (category_fts, rowid, owner, category)
+            VALUES ('delete', OLD.id, 'u' || OLD.user_id, OLD.category);
+        END;
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_search_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            {_FTS_ADD}
+            {_CATEGORY_ADD}
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_search_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            {_FTS_REMOVE}
+            {_CATEGORY_REMOVE}
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_search_update
+        AFTER UPDATE OF category, note, user_id ON transactions
+        BEGIN
+            {_FTS_REMOVE}
+            {_CATEGORY_REMOVE}
+            {_FTS_ADD}
+            {_CATEGORY_ADD}
+        END;
+    """)
+
+    fill_search_index(cursor)
+
+
+# --------------------------------------------------
+# 15: rate history version
+# --------------------------------------------------
+# One counter bumped by trigger on every rate_history write, so a load by
+# the CLI (another process) invalidates the app's loaded history and the
+# dashboard caches keyed on it.
+_RATE_HISTORY_BUMP = "UPDATE rate_history_version SET version = version + 1;"
+
+
+@migration(15, "add rate_history_version counter")
+def _create_rate_history_version(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rate_history_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        );
+    """)
+    cursor.execute("INSERT OR IGNORE INTO rate_history_version (id, version) VALUES (1, 0);")
+
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rate_history_version_{event.lower()}
+            AFTER {event} ON rate_history
+            BEGIN
+                {_RATE_HISTORY_BUMP}
+            END;
+        """)
+
+
+# --------------------------------------------------
+# 16: rate history version of stored dashboards
+# --------------------------------------------------
+# A snapshot computed before a rate history load converts with the old
+# quotes; -1 never matches, so existing snapshots are recomputed once.
+@migration(16, "add history_version to dashboard_snapshots")
+def _add_snapshot_history_version(cursor: sqlite3.Cursor):
+    columns = {c["name"] for c in _table_columns(cursor, "dashboard_snapshots")}
+    if "history_version" not in columns:
+        cursor.execute("""
+            ALTER TABLE dashboard_snapshots
+            ADD COLUMN history_version INTEGER NOT NULL DEFAULT -1;
+        """)
+
+
+# --------------------------------------------------
+# 17: deferred search indexing for bulk imports
+# --------------------------------------------------
+# The per-row search triggers dominate a large import. While a row is in
+# search_index_deferred the insert trigger does nothing and the importer
+# indexes the whole chunk with index_transactions_after() instead. The row
+# only ever exists inside the importer's write transaction, so no other
+# connection sees it (SQLite triggers cannot read TEMP tables).
+def index_transactions_after(cursor: sqlite3.Cursor, user_id: int, after_id: int):
+    """Index one user's transactions with id > after_id, as the triggers would."""
+    cursor.execute("""
+        INSERT INTO transactions_fts (rowid, owner, category, note)
+        SELECT id, 'u' || user_id, category, note FROM transactions
+        WHERE user_id = ? AND id > ?;
+    """, (user_id, after_id))
+    cursor.execute("""
+        INSERT INTO user_categories (user_id, category, row_count)
+        SELECT user_id, category, COUNT(*) FROM transactions
+        WHERE user_id = ? AND id > ?
+        GROUP BY user_id, category
+        ON CONFLICT (user_id, category) DO UPDATE SET row_count = row_count + excluded.row_count;
+    """, (user_id, after_id))
+
+
+@migration(17, "skip per-row search indexing during bulk imports")
+def _defer_search_index(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS search_index_deferred (
+            id INTEGER PRIMARY KEY CHECK (id = 1)
+        );
+    """)
+    cursor.execute("DROP TRIGGER IF EXISTS trg_transactions_search_insert;")
+    cursor.execute(f"""
+        CREATE TRIGGER trg_transactions_search_insert
+        AFTER INSERT ON transactions
+        WHEN NOT EXISTS (SELECT 1 FROM search_index_deferred)
+        BEGIN
+            {_FTS_ADD}
+            {_CATEGORY_ADD}
+        END;
+    """)
+
+
+# --------------------------------------------------
+# 18: session revocation counter
+# --------------------------------------------------
+# Bumped by trigger whenever a live session row is deleted (logout,
+# password change, user deletion) in any process. Session caches compare
+# it before trusting a cached session. Sweeping expired rows does not
+# bump it.
+@migration(18, "add session_revocations counter")
+def _create_session_revocations(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS session_revocations (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        );
+    """)
+    cursor.execute("INSERT OR IGNORE INTO session_revocations (id, version) VALUES (1, 0);")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_sessions_revoke
+        AFTER DELETE ON sessions
+        WHEN OLD.expires_at > CAST(strftime('%s', 'now') AS REAL)
+        BEGIN
+            UPDATE session_revocations SET version = version + 1;
+        END;
+    """)
+
+
+# --------------------------------------------------
+# Runner
+# --------------------------------------------------
+def _ensure_version_table(conn: sqlite3.Connection):
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            );
+        """)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    _ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) AS v FROM schema_version;").fetchone()
+    return row["v"] or 0
+
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Apply every pending migration in order and return the resulting
+    schema version. Safe to call on every start-up and from several
+    processes at once: each step takes the write lock (BEGIN IMMEDIATE)
+    and re-checks the version before doing anything.
+    """
+    _ensure_version_table(conn)
+
+    for version, description, step in MIGRATIONS:
+        if current_version(conn) >= version:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            applied = conn.execute(
+                "SELECT 1 FROM schema_version WHERE version = ?;", (version,)
+            ).fetchone()
+
+            if not applied:
+                step(conn.cursor())
+                conn.execute("""
+                    INSERT INTO schema_version (version, description, applied_at)
+                    VALUES (?, ?, ?);
+                """, (version, description, datetime.now().isoformat()))
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return current_version(conn)
+
@@ -1,7 +1,13 @@
 # models.py
 
+import math
+import threading
+from array import array
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Union
+
+import numpy as np
 
 
 class ValidationError(Exception):
@@ -9,24 +15,145 @@ class ValidationError(Exception):
     pass
 
 
-@dataclass
+# --------------------------------------------------
+# Money: integer minor units
+# --------------------------------------------------
+# Every currency is stored in hundredths (cents, pyas, sen, ...), the
+# precision amounts have always been entered and rounded to. Sums of
+# integers are exact, so totals never drift.
+MINOR_PER_MAJOR = 100
+
+# Largest amount accepted: exact as a float64 (conversion multiplies by
+# float rates), with thousands of them still summing within int64.
+MAX_AMOUNT_MINOR = 10 ** 15      # 10 trillion in major units
+
+
+def to_minor(amount: float) -> int:
+    """12.34 -> 1234 (half-even rounding of the nearest cent)."""
+    return int(round(amount * MINOR_PER_MAJOR))
+
+
+def to_major(minor: int) -> float:
+    """1234 -> 12.34"""
+    return minor / MINOR_PER_MAJOR
+
+
+# --------------------------------------------------
+# Dates: integer epoch days and month indexes
+# --------------------------------------------------
+# Stored dates are days since 1970-01-01 and months are counted since
+# 1970-01, so ranges and month bucketing are plain integer arithmetic.
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_epoch_day(d: Union[date, datetime]) -> int:
+    return d.toordinal() - _EPOCH_ORDINAL
+
+
+def from_epoch_day(day: int) -> date:
+    return date.fromordinal(day + _EPOCH_ORDINAL)
+
+
+# Range of days a date can represent (0001-01-01 .. 9999-12-31)
+MIN_EPOCH_DAY = date.min.toordinal() - _EPOCH_ORDINAL
+MAX_EPOCH_DAY = date.max.toordinal() - _EPOCH_ORDINAL
+
+
+def month_of_day(day: int) -> int:
+    d = from_epoch_day(day)
+    return (d.year - 1970) * 12 + d.month - 1
+
+
+def month_first_day(month: int) -> int:
+    return to_epoch_day(date(1970 + month // 12, month % 12 + 1, 1))
+
+
+def month_key(month: int) -> str:
+    """Month index -> "YYYY-MM" (the key format analytics returns)."""
+    return f"{1970 + month // 12:04d}-{month % 12 + 1:02d}"
+
+
+# --------------------------------------------------
+# Interned codes for currencies and categories
+# --------------------------------------------------
+class CodeTable:
+    """
+    Process-wide string <-> small int mapping. Codes are assigned on first
+    use and never change, so they are safe to keep in arrays; they are NOT
+    stable across processes and are never written to the database.
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+
+    def code(self, name: str) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(name)
+                if code is None:
+                    code = len(self._names)
+                    self._names.append(name)
+                    self._codes[name] = code
+        return code
+
+    def name(self, code: int) -> str:
+        return self._names[code]
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+CURRENCY_CODES = CodeTable()
+CATEGORY_CODES = CodeTable()
+
+TRANSACTION_TYPES = ("Income", "Expense")
+MAX_NOTE_LENGTH = 500
+
+
+# --------------------------------------------------
+# Single transaction
+# --------------------------------------------------
+@dataclass(slots=True)
 class Transaction:
     t_type: str
-    amount: float
-    currency: str
-    category: str
+    amount_minor: int
+    currency_code: int
+    category_code: int
     date: datetime
+    note: str = ""
+
+    @property
+    def amount(self) -> float:
+        return to_major(self.amount_minor)
+
+    @property
+    def currency(self) -> str:
+        return CURRENCY_CODES.name(self.currency_code)
+
+    @property
+    def category(self) -> str:
+        return CATEGORY_CODES.name(self.category_code)
 
     @staticmethod
     def validate_type(t_type: str):
-        valid_types = ["Income", "Expense"]
-        if t_type not in valid_types:
+        if t_type not in TRANSACTION_TYPES:
             raise ValidationError(f"Invalid transaction type: {t_type}")
 
     @staticmethod
     def validate_amount(amount: float):
-        if amount <= 0:
+        if not math.isfinite(amount):
+            raise ValidationError("Amount must be a number.")
+        amount_minor = to_minor(amount)
+        if amount_minor <= 0:
             raise ValidationError("Amount must be greater than zero.")
+        if amount_minor > MAX_AMOUNT_MINOR:
+            raise ValidationError(f"Amount cannot be more than {to_major(MAX_AMOUNT_MINOR):,.0f}.")
 
 
     @staticmethod
@@ -34,6 +161,11 @@ class Transaction:
         if not category.strip():
             raise ValidationError("Category cannot be empty.")
 
+    @staticmethod
+    def validate_note(note: str):
+        if len(note) > MAX_NOTE_LENGTH:
+            raise ValidationError(f"Note cannot be longer than {MAX_NOTE_LENGTH} characters.")
+
     @staticmethod
     def validate_date(date_input):
         if not isinstance(date_input, (str, datetime)):
@@ -47,18 +179,108 @@ class Transaction:
             raise ValidationError("Date must be in YYYY-MM-DD format.")
 
     @classmethod
-    def create(cls, t_type: str, amount: float, currency: str, category: str, date_input):
+    def create(cls, t_type: str, amount: float, currency: str, category: str, date_input,
+               note: str = ""):
         """Factory method that validates fields before creating an object."""
 
         cls.validate_type(t_type)
         cls.validate_amount(amount)
         cls.validate_category(category)
+        cls.validate_note(note.strip())
         date_parsed = cls.validate_date(date_input)
 
         return cls(
             t_type=t_type,
-            amount=amount,
-            currency=currency,
-            category=category,
-            date=date_parsed
+            amount_minor=to_minor(amount),
+            currency_code=CURRENCY_CODES.code(currency),
+            category_code=CATEGORY_CODES.code(category),
+            date=date_parsed,
+            note=note.strip()
+        )
+
+
+# --------------------------------------------------
+# Many transactions: parallel typed arrays
+# --------------------------------------------------
+class TransactionBatch:
+    """
+    Column-oriented, append-only batch of transactions for bulk work:
+    about 27 bytes per row instead of a Row/dict/object per row.
+    Rows come from database tuples (id, t_type, amount_minor, currency,
+    category, day) as yielded by iter_transactions_for_user().
+    The numpy_* accessors are zero-copy views over the arrays.
+    """
+
+    __slots__ = ("ids", "is_income", "amount_minor", "currency_codes",
+                 "category_codes", "days")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.is_income = array("b")
+        self.amount_minor = array("q")
+        self.currency_codes = array("H")
+        self.category_codes = array("I")
+        self.days = array("i")             # days since 1970-01-01
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "TransactionBatch":
+        batch = cls()
+        batch.extend(rows)
+        return batch
+
+    def extend(self, rows: Iterable[tuple]):
+        currency_code = CURRENCY_CODES.code
+        category_code = CATEGORY_CODES.code
+
+        for row_id, t_type, amount_minor, currency, category, day in rows:
+            self.ids.append(row_id)
+            self.is_income.append(t_type == "Income")
+            self.amount_minor.append(amount_minor)
+            self.currency_codes.append(currency_code(currency))
+            self.category_codes.append(category_code(category))
+            self.days.append(day)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i: int) -> Transaction:
+        return Transaction(
+            t_type="Income" if self.is_income[i] else "Expense",
+            amount_minor=self.amount_minor[i],
+            currency_code=self.currency_codes[i],
+            category_code=self.category_codes[i],
+            date=datetime.fromordinal(self.days[i] + _EPOCH_ORDINAL),
         )
+
+    def __iter__(self) -> Iterator[Transaction]:
+        return (self[i] for i in range(len(self)))
+
+    def numpy_amount_minor(self) -> np.ndarray:
+        return np.frombuffer(self.amount_minor, dtype=np.int64)
+
+    def numpy_is_income(self) -> np.ndarray:
+        return np.frombuffer(self.is_income, dtype=np.int8).astype(bool)
+
+    def numpy_currency_codes(self) -> np.ndarray:
+        return np.frombuffer(self.currency_codes, dtype=np.uint16)
+
+    def numpy_category_codes(self) -> np.ndarray:
+        return np.frombuffer(self.category_codes, dtype=np.uint32)
+
+    def numpy_days(self) -> np.ndarray:
+        return np.frombuffer(self.days, dtype=np.int32)
+
+    def totals_minor(self) -> dict:
+        """Exact native-currency income/expense sums per currency code."""
+        amounts = self.numpy_amount_minor()
+        income = self.numpy_is_income()
+        codes = self.numpy_currency_codes()
+
+        totals = {}
+        for code in np.unique(codes):
+            in_currency = codes == code
+            totals[CURRENCY_CODES.name(int(code))] = {
+                "income": int(amounts[in_currency & income].sum()),
+                "expense": int(amounts[in_currency & ~income].sum()),
+            }
+        return totals
@@ -0,0 +1,196 @@
+# precompute.py
+#
+# Offline computation of every user's "All time" dashboard into the
+# dashboard_snapshots table, so the first render after login reads one row
+# instead of computing. Users are split into chunks and spread over a
+# process pool; workers only read (WAL readers run in parallel) and send
+# their results back, and the parent is the only writer: it refits the
+# forecast state before fanning out, and workers refit any state that went
+# out of date since in memory without storing it.
+#
+#   python -m core.precompute                     # all users, one worker per core
+#   python -m core.precompute --workers 4 --chunk-size 100
+#
+# A stored snapshot is served while the user's data version (counted by
+# trigger, see core/migrations.py step 13), the rate history version and
+# the base currency match and the rates it was computed with are still
+# within their TTL; otherwise the dashboard recomputes and stores it again.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import Callable, List, Optional
+
+from core import database
+from core.analytics import build_dashboard_snapshot
+from core.forecast import forecast_for_user, rebuild as rebuild_forecasts
+from core.rate_history import get_rate_history, history_version
+from core.settings import get_user_setting
+from core.tracing import traced
+
+DEFAULT_CHUNK_SIZE = 64
+
+
+# --------------------------------------------------
+# One user's dashboard data
+# --------------------------------------------------
+@traced("analytics")
+def compute_dashboard(user_id: int, base: str, rate_for: Callable[[str], float],
+                      start=None, end=None, read_only: bool = False) -> dict:
+    """
+    Everything the dashboard shows before plotting:
+    {"snapshot": build_dashboard_snapshot(...), "forecast": forecast_for_user(...)}
+    read_only: never write (out-of-date forecast state is not stored).
+    """
+    # Rows the rate history covers convert at their own date's rate
+    history = get_rate_history()
+
+    snapshot = build_dashboard_snapshot(
+        user_id,
+        None,       # rate_for is always given, so per-row convert() is unused
+        rate_for=rate_for,
+        base=base,
+        start=start,
+        end=end,
+        history=history if len(history) else None,
+    )
+
+    # Next month from the stored smoothing state (whole history, not the period)
+    forecast = forecast_for_user(user_id, rate_for, base, persist=not read_only)
+    return {"snapshot": snapshot, "forecast": forecast}
+
+
+def snapshot_row(user_id: int, base: str, data_version: int, history_version: int,
+                 rates_fetched_at: float, data: dict) -> tuple:
+    """
+    A dashboard_snapshots row; data_version and history_version must be
+    read BEFORE computing.
+    """
+    return (user_id, base, data_version, history_version, rates_fetched_at, time.time(),
+            json.dumps(data, separators=(",", ":")))
+
+
+def load_snapshot(user_id: int, base: str, max_rates_age: float) -> Optional[dict]:
+    """The stored compute_dashboard() result, or None if missing or stale."""
+    row = database.get_dashboard_snapshot_row(user_id)
+    if row is None or row["base"] != base:
+        return None
+    if time.time() - row["rates_fetched_at"] > max_rates_age:
+        return None
+    if row["data_version"] != database.get_stored_data_version(user_id):
+        return None
+    if row["history_version"] != history_version():
+        return None
+    return json.loads(row["payload"])
+
+
+def store_snapshot(user_id: int, base: str, data_version: int, history_version: int,
+                   rates_fetched_at: float, data: dict):
+    database.store_dashboard_snapshots([
+        snapshot_row(user_id, base, data_version, history_version, rates_fetched_at, data)
+    ])
+
+
+# --------------------------------------------------
+# Worker processes
+# --------------------------------------------------
+def _init_worker(db_path: str):
+    database.DB_NAME = db_path
+    database.get_connection().execute("PRAGMA query_only = ON;")    # workers never write
+
+    # Rates come from the table the parent refreshed; no HTTP from workers,
+    # and query_only covers this thread's connection only, so stale rates
+    # must not start a refresh thread that writes through its own
+    from api import currency_api
+    currency_api.BACKGROUND_REFRESH = False
+    currency_api.ensure_rate_matrix(fetch=False)
+
+
+def _compute_chunk(user_ids: List[int]) -> List[tuple]:
+    from api import currency_api
+
+    rows = []
+    for user_id in user_ids:
+        base = get_user_setting(user_id, "base_currency")
+        version = database.get_stored_data_version(user_id)
+        rates_version = history_version()
+        data = compute_dashboard(user_id, base, partial(currency_api.get_rate, base), read_only=True)
+        rows.append(snapshot_row(user_id, base, version, rates_version,
+                                 currency_api.rates_fetched_at(), data))
+    return rows
+
+
+def _chunks(items: List[int], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def precompute_all(workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   user_ids: Optional[List[int]] = None, progress=None) -> int:
+    """
+    Compute and store every user's (or user_ids') dashboard snapshot;
+    returns the number stored. progress(done, total) is called per chunk.
+    """
+    from api import currency_api
+
+    database.init_db()
+    database.init_settings()
+    if user_ids is None:
+        user_ids = database.get_user_ids()
+
+    # Shared inputs are brought up to date once, here, not per worker:
+    # fresh rates in the exchange_rates table and fitted forecast state
+    # (workers then only read it).
+    currency_api.ensure_rate_matrix()
+    rebuild_forecasts()
+
+    workers = workers or os.cpu_count() or 1
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        # spawn: SQLite connections must not be inherited across fork()
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(database.DB_NAME,),
+    ) as pool:
+        futures = [pool.submit(_compute_chunk, chunk) for chunk in _chunks(user_ids, chunk_size)]
+        for future in as_completed(futures):
+            rows = future.result()
+            database.store_dashboard_snapshots(rows)
+            done += len(rows)
+            if progress is not None:
+                progress(done, len(user_ids))
+
+    return done
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute every user's dashboard")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="users per task")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        if not args.quiet:
+            print(f"\r{done}/{total} users", end="", flush=True)
+
+    started = time.perf_counter()
+    count = precompute_all(args.workers, args.chunk_size, progress=progress)
+    elapsed = time.perf_counter() - started
+
+    if not args.quiet:
+        print()
+    print(f"Stored {count} dashboard snapshot(s) in {elapsed:.1f} s "
+          f"({count / elapsed if elapsed else 0:.0f} users/s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
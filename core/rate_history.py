@@ -0,0 +1,197 @@
+# rate_history.py
+#
+# Dated exchange rates and as-of conversion.
+#
+# The rate_history table holds, per currency and day, units of that
+# currency per 1 PIVOT (USD), the same quote format /live returns. A
+# transaction converts at the latest quote on or before its own date, so
+# past totals stay put when today's rate moves. The live refresher adds
+# one quote per day; older history is loaded in bulk from a file:
+#
+#   python -m core.rate_history load rates.csv     # header: date,currency,rate
+#   python -m core.rate_history info
+
+import argparse
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.database import get_rate_history_version, init_db, iter_rate_history, store_rate_history
+from core.tracing import traced
+
+PIVOT = "USD"
+REQUIRED_COLUMNS = ["date", "currency", "rate"]
+EPOCH = pd.Timestamp("1970-01-01")     # stored days are days since this
+
+# Loaded series, reloaded when the stored version moves (any process)
+_history = None
+_history_loaded_version = -1
+_lock = threading.Lock()
+
+
+class RateFileError(Exception):
+    """The rate file cannot be loaded (missing columns or invalid rows)."""
+    pass
+
+
+# --------------------------------------------------
+# In-memory series
+# --------------------------------------------------
+class RateHistory:
+    """
+    Per-currency quotes as sorted NumPy arrays:
+        series[currency] = (days int64 ascending, per_pivot float64)
+    """
+
+    def __init__(self, series: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        self.series = series
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "RateHistory":
+        """Build from (currency, day, per_pivot) tuples sorted by currency, day."""
+        frame = pd.DataFrame(list(rows), columns=["currency", "day", "per_pivot"])
+        series = {
+            currency: (group["day"].to_numpy(np.int64), group["per_pivot"].to_numpy(np.float64))
+            for currency, group in frame.groupby("currency", sort=False)
+        }
+        return cls(series)
+
+    def __len__(self):
+        return sum(len(days) for days, _ in self.series.values())
+
+    def first_day(self) -> Optional[int]:
+        """Epoch day of the earliest stored quote; None without history."""
+        if not self.series:
+            return None
+        return min(int(days[0]) for days, _ in self.series.values())
+
+    def per_pivot_on(self, currency: str, days: np.ndarray) -> np.ndarray:
+        """
+        As-of quotes for ascending `days`: the latest quote on or before each
+        day, NaN before the first quote (no history there; callers fall back
+        to the current rate).
+        """
+        if currency == PIVOT:
+            return np.ones(len(days))
+
+        quotes = np.full(len(days), np.nan)
+        if currency not in self.series:
+            return quotes
+
+        known_days, per_pivot = self.series[currency]
+        # both sides are sorted, so this is a merge of the two day columns
+        idx = np.searchsorted(known_days, days, side="right") - 1
+        covered = idx >= 0
+        quotes[covered] = per_pivot[idx[covered]]
+        return quotes
+
+    def rate_table(self, base: str, currencies: List[str], days: np.ndarray) -> np.ndarray:
+        """
+        rates[i, k] = value of 1 currencies[i] in `base` on days[k]
+        (ascending), NaN where either side has no history that day.
+        """
+        base_quotes = self.per_pivot_on(base, days)
+        rates = np.empty((len(currencies), len(days)))
+        for i, currency in enumerate(currencies):
+            rates[i] = base_quotes / self.per_pivot_on(currency, days)
+        return rates
+
+
+def history_version() -> int:
+    """
+    Changes whenever any process stores quotes (trigger-maintained, see
+    core/migrations.py step 15); usable in cache keys.
+    """
+    return get_rate_history_version()
+
+
+@traced("rates")
+def get_rate_history() -> RateHistory:
+    """The stored history, loaded once and reloaded after any write to it."""
+    global _history, _history_loaded_version
+
+    version = history_version()
+    if _history is None or _history_loaded_version != version:
+        with _lock:
+            if _history is None or _history_loaded_version != version:
+                _history = RateHistory.from_rows(iter_rate_history())
+                _history_loaded_version = version
+    return _history
+
+
+def record_quotes(quotes: Dict[str, float], day: int):
+    """Store one day's pivot quotes ({currency: per_pivot}), e.g. from /live."""
+    store_rate_history([(c, day, rate) for c, rate in quotes.items() if c != PIVOT])
+
+
+# --------------------------------------------------
+# Bulk load from CSV
+# --------------------------------------------------
+def _read_rate_file(source) -> pd.DataFrame:
+    frame = pd.read_csv(source, dtype=str, keep_default_na=False, skipinitialspace=True)
+    frame = frame.rename(columns=lambda c: c.strip().lower())
+
+    missing = [c for c in REQUIRED_COLUMNS if c not in frame.columns]
+    if missing:
+        raise RateFileError(f"Missing column(s): {', '.join(missing)}")
+
+    date = pd.to_datetime(frame["date"].str.strip(), format="%Y-%m-%d", errors="coerce")
+    rate = pd.to_numeric(frame["rate"].str.strip(), errors="coerce")
+    currency = frame["currency"].str.strip().str.upper()
+
+    bad = date.isna() | ~(rate > 0) | (currency == "")
+    if bad.any():
+        line = int(bad.idxmax()) + 2     # +1 header, +1 one-based
+        raise RateFileError(f"Line {line}: expected YYYY-MM-DD date, currency and a positive rate.")
+
+    return pd.DataFrame({
+        "currency": currency,
+        "day": (date - EPOCH).dt.days.astype(np.int64),
+        "per_pivot": rate.astype(np.float64),
+    })
+
+
+def import_rate_file(source) -> int:
+    """
+    Load `source` (path or file-like CSV of date,currency,rate where rate is
+    units of currency per 1 USD) in one transaction. Later duplicates of a
+    (currency, date) win. Nothing is written if any row is invalid.
+    """
+    frame = _read_rate_file(source)
+    frame = frame[frame["currency"] != PIVOT]
+    store_rate_history(frame.itertuples(index=False, name=None))
+    return len(frame)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Manage historical exchange rates")
+    sub = parser.add_subparsers(dest="command", required=True)
+    load = sub.add_parser("load", help="bulk load a date,currency,rate CSV")
+    load.add_argument("csv_file")
+    sub.add_parser("info", help="show the stored coverage per currency")
+    args = parser.parse_args(argv)
+
+    init_db()
+
+    if args.command == "load":
+        try:
+            count = import_rate_file(args.csv_file)
+        except RateFileError as e:
+            print(f"Load failed: {e}", file=sys.stderr)
+            return 1
+        print(f"Loaded {count} quote(s).")
+        return 0
+
+    history = get_rate_history()
+    for currency, (days, _) in sorted(history.series.items()):
+        first, last = days[[0, -1]].astype("datetime64[D]")
+        print(f"{currency}: {len(days)} quote(s), {first} .. {last}")
+    print(f"{len(history)} quote(s) in total.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
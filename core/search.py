@@ -0,0 +1,125 @@
+# search.py
+#
+# Full-text search over transaction categories and notes, and category
+# autocomplete, on the FTS5 indexes kept by triggers (core/migrations.py,
+# step 14). Every query is pinned to one user by the indexed owner token,
+# so its cost depends on that user's matches, not on the table size.
+#
+#   python -m core.search rebuild     # rebuild the indexes from transactions
+#   python -m core.search query --user 1 "groc"
+
+import argparse
+import re
+import sqlite3
+import sys
+from typing import List, Optional
+
+from core.database import get_connection, init_db
+from core.migrations import fill_search_index
+from core.tracing import traced
+
+DEFAULT_SUGGESTIONS = 10
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(user_id: int, text: str, columns: str) -> Optional[str]:
+    """
+    FTS5 query for `text` typed by a user: every word must appear (as a
+    word prefix) in one of `columns`, e.g. "{category note}". User input
+    is reduced to quoted word tokens, so it can never inject FTS syntax.
+    None if there is nothing to search for.
+    """
+    terms = _TERM.findall(text)
+    if not terms:
+        return None
+    words = " AND ".join(f'"{t}"*' for t in terms)
+    return f"owner:u{int(user_id)} AND {columns}: ({words})"
+
+
+@traced("db")
+def suggest_categories(user_id: int, prefix: str = "", limit: int = DEFAULT_SUGGESTIONS) -> List[str]:
+    """
+    This user's categories with a word starting with each word of
+    `prefix` (case- and accent-insensitive), most used first. An empty
+    prefix returns the most used categories.
+    """
+    conn = get_connection()
+    query = match_expression(user_id, prefix, "category")
+
+    if query is None:
+        rows = conn.execute("""
+            SELECT category FROM user_categories
+            WHERE user_id = ?
+            ORDER BY row_count DESC, category
+            LIMIT ?;
+        """, (user_id, limit))
+    else:
+        rows = conn.execute("""
+            SELECT c.category FROM category_fts f
+            JOIN user_categories c ON c.id = f.rowid
+            WHERE category_fts MATCH ?
+            ORDER BY c.row_count DESC, c.category
+            LIMIT ?;
+        """, (query, limit))
+    return [r["category"] for r in rows]
+
+
+@traced("db")
+def search_transactions(user_id: int, text: str, limit: int = 50,
+                        before_id: Optional[int] = None) -> List[sqlite3.Row]:
+    """
+    This user's transactions whose category or note contains every word
+    of `text` as a word prefix, newest id first. Keyset pages: pass the
+    last id of the previous page as before_id.
+    """
+    query = match_expression(user_id, text, "{category note}")
+    if query is None:
+        return []
+
+    # the FTS index yields matching ids in rowid order and stops at limit;
+    # only those rows are then read from transactions
+    conn = get_connection()
+    return conn.execute("""
+        SELECT * FROM transactions
+        WHERE id IN (
+            SELECT rowid FROM transactions_fts
+            WHERE transactions_fts MATCH ? AND rowid < ?
+            ORDER BY rowid DESC
+            LIMIT ?
+        ) AND user_id = ?
+        ORDER BY id DESC;
+    """, (query, before_id if before_id is not None else 2 ** 63 - 1, limit, user_id)).fetchall()
+
+
+def rebuild():
+    """Rebuild the search indexes from transactions in one write transaction."""
+    conn = get_connection()
+    with conn:
+        fill_search_index(conn.cursor())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Transaction search index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="rebuild the indexes from transactions")
+    query = sub.add_parser("query", help="search one user's transactions")
+    query.add_argument("text")
+    query.add_argument("--user", type=int, required=True)
+    query.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    init_db()
+
+    if args.command == "rebuild":
+        rebuild()
+        print("Search indexes rebuilt.")
+        return 0
+
+    print("Categories:", ", ".join(suggest_categories(args.user, args.text)) or "-")
+    for row in search_transactions(args.user, args.text, args.limit):
+        print(f"{row['id']}: {row['t_type']} {row['category']} {row['note']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# sessions.py
+#
+# Signed, expiring login sessions so a page reload does not need another
+# password check.
+#
+# Token format:  <random id>.<expires_at>.<hmac-sha256(secret, id.expires_at)>
+# The signature and expiry are checked before any lookup, so forged or
+# expired tokens never reach SQLite. Valid sessions are cached in memory;
+# the sessions table only stores sha256(id). The cache is per process, so
+# every entry remembers the trigger-maintained revocation counter (one
+# row, see core/migrations.py step 18) it was read under; once any process
+# revokes a session, cached entries are re-read from the table.
+#
+# The token is kept in the page URL (?session=...): Streamlit can read
+# cookies (st.context.cookies) but cannot set them. The URL is saved in
+# browser history and goes wherever the link is copied or shared. To limit
+# that, tokens are short-lived and are revoked on logout and on a
+# password change.
+
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from typing import Dict, Optional
+
+from core.cache import LRUCache
+from core.database import (
+    delete_expired_sessions,
+    delete_sessions,
+    get_session_hashes_for_user,
+    get_session_revocation_version,
+    get_session_row,
+    insert_session,
+)
+from core.settings import get_setting
+
+# Tokens travel in the page URL (see above), so they are short-lived.
+SESSION_TTL_SECONDS = int(os.environ.get("MONEYTRACKER_SESSION_TTL", 12 * 60 * 60))
+TOKEN_BYTES = 24
+
+# token_hash -> {"id", "username", "expires_at", "revocations"}
+SESSION_CACHE = LRUCache(max_entries=10_000, max_bytes=8 * 1024 * 1024)
+
+
+def _secret() -> bytes:
+    # MONEYTRACKER_SESSION_SECRET lets several deployments share tokens;
+    # otherwise the key init_settings() generated for this database is used.
+    return (os.environ.get("MONEYTRACKER_SESSION_SECRET")
+            or get_setting("session_secret")).encode("utf-8")
+
+
+def _sign(payload: str) -> str:
+    return hmac.new(_secret(), payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _token_hash(session_id: str) -> str:
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+
+
+def _parse(token: Optional[str]):
+    """Return (token_hash, expires_at) for a well-signed token, else None."""
+    if not token:
+        return None
+
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    session_id, expires, signature = parts
+
+    try:
+        expires_at = int(expires)
+    except ValueError:
+        return None
+
+    if not hmac.compare_digest(signature, _sign(f"{session_id}.{expires}")):
+        return None
+    return _token_hash(session_id), expires_at
+
+
+# --------------------------------------------------
+# Public API
+# --------------------------------------------------
+def create_session(user_id: int, username: str) -> str:
+    """Persist a new session and return its token."""
+    now = time.time()
+    expires_at = int(now + SESSION_TTL_SECONDS)
+    session_id = secrets.token_urlsafe(TOKEN_BYTES)
+    token_hash = _token_hash(session_id)
+
+    delete_expired_sessions(now)    # keep the table small
+    insert_session(token_hash, user_id, now, expires_at)
+    SESSION_CACHE.put(token_hash, {"id": user_id, "username": username, "expires_at": expires_at,
+                                    "revocations": get_session_revocation_version()})
+
+    return f"{session_id}.{expires_at}.{_sign(f'{session_id}.{expires_at}')}"
+
+
+def validate_session(token: Optional[str]) -> Optional[Dict]:
+    """
+    Return the user dict (id, username) for a valid, unexpired token,
+    else None. Repeat checks of a live session are a cache hit plus one
+    single-row read of the revocation counter.
+    """
+    parsed = _parse(token)
+    if parsed is None:
+        return None
+
+    token_hash, expires_at = parsed
+    if expires_at <= time.time():
+        SESSION_CACHE.discard(token_hash)
+        return None
+
+    # read before the row, so an entry never claims a newer version than it saw
+    revocations = get_session_revocation_version()
+    session = SESSION_CACHE.get(token_hash)
+    if session is None or session["revocations"] != revocations:
+        row = get_session_row(token_hash)
+        if row is None or row["expires_at"] <= time.time():
+            SESSION_CACHE.discard(token_hash)
+            return None
+        session = {"id": row["user_id"], "username": row["username"],
+                   "expires_at": row["expires_at"], "revocations": revocations}
+        SESSION_CACHE.put(token_hash, session)
+
+    return {"id": session["id"], "username": session["username"]}
+
+
+def revoke_session(token: Optional[str]):
+    """Log out one session (no-op for invalid tokens)."""
+    parsed = _parse(token)
+    if parsed is None:
+        return
+
+    token_hash = parsed[0]
+    SESSION_CACHE.discard(token_hash)
+    delete_sessions([token_hash])
+
+
+def revoke_user_sessions(user_id: int):
+    """Log a user out everywhere (e.g. after a password change)."""
+    hashes = get_session_hashes_for_user(user_id)
+    for token_hash in hashes:
+        SESSION_CACHE.discard(token_hash)
+    delete_sessions(hashes)
@@ -0,0 +1,79 @@
+# settings.py
+#
+# Cached read/write access to the settings and user_settings tables.
+# Reads are served from memory after the first lookup, so hot paths such as
+# convert_to_base() never touch SQLite. Every write goes through this
+# module, which invalidates the cache and bumps SETTINGS_VERSION.
+# The cache is per process; writes made by another process are not seen
+# until clear_cache() is called there.
+
+import threading
+from typing import Optional
+
+from core import database
+
+_MISSING = object()
+
+_cache = {}          # (user_id or None, key) -> value (None if unset)
+_lock = threading.Lock()
+SETTINGS_VERSION = 0
+
+
+def settings_version() -> int:
+    """Incremented on every write; usable as part of a cache key."""
+    return SETTINGS_VERSION
+
+
+def _bump(cache_key):
+    global SETTINGS_VERSION
+    with _lock:
+        _cache.pop(cache_key, None)
+        SETTINGS_VERSION += 1
+
+
+def _load(cache_key, loader):
+    # Only cache the value if no write happened while it was being read
+    version = SETTINGS_VERSION
+    value = loader()
+    with _lock:
+        if SETTINGS_VERSION == version:
+            _cache[cache_key] = value
+    return value
+
+
+def clear_cache():
+    global SETTINGS_VERSION
+    with _lock:
+        _cache.clear()
+        SETTINGS_VERSION += 1
+
+
+# --------------------------------------------------
+# Global settings
+# --------------------------------------------------
+def get_setting(key: str) -> Optional[str]:
+    value = _cache.get((None, key), _MISSING)
+    if value is _MISSING:
+        value = _load((None, key), lambda: database.get_setting(key))
+    return value
+
+
+def set_setting(key: str, value: str):
+    database.set_setting(key, value)
+    _bump((None, key))
+
+
+# --------------------------------------------------
+# Per-user settings (fall back to the global value)
+# --------------------------------------------------
+def get_user_setting(user_id: int, key: str) -> Optional[str]:
+    value = _cache.get((user_id, key), _MISSING)
+    if value is _MISSING:
+        value = _load((user_id, key), lambda: database.get_user_setting(user_id, key))
+
+    return value if value is not None else get_setting(key)
+
+
+def set_user_setting(user_id: int, key: str, value: str):
+    database.set_user_setting(user_id, key, value)
+    _bump((user_id, key))
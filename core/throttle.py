@@ -0,0 +1,56 @@
+# throttle.py
+#
+# In-memory token buckets for cheap rejection of request floods.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Tuple
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key: each attempt takes a token, tokens refill at
+    `refill_per_second` up to `capacity`. Keys are kept in LRU order and
+    the least recently used are dropped past `max_keys`, so a flood of
+    distinct keys cannot grow memory without bound (a dropped key simply
+    starts again with a full bucket). Per process; thread-safe.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = 100_000):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()     # key -> (tokens, last refill time)
+        self._lock = threading.Lock()
+
+    def _refilled(self, key: Hashable, now: float) -> float:
+        tokens, last = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - last) * self.refill_per_second)
+
+    def try_acquire(self, key: Hashable) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)."""
+        now = time.monotonic()
+
+        with self._lock:
+            tokens = self._refilled(key, now)
+
+            if tokens >= 1.0:
+                allowed, tokens, retry_after = True, tokens - 1.0, 0.0
+            else:
+                allowed, retry_after = False, (1.0 - tokens) / self.refill_per_second
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, retry_after
+
+    def reset(self, key: Hashable):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
@@ -0,0 +1,268 @@
+# tracing.py
+#
+# Opt-in instrumentation: per-rerun span timings, SQL statement counts,
+# rows returned and a slow-query log with EXPLAIN QUERY PLAN.
+#
+# Nothing is recorded unless a trace is active on the current thread
+# (start_trace() ... finish_trace()); otherwise @traced costs one
+# thread-local lookup per call. Slow queries are kept on the trace that
+# ran them, with literals replaced by "?" (no bound values are logged).
+
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+import sqlite3
+
+# Database spans slower than this get their statements' query plans logged
+SLOW_QUERY_MS = float(os.environ.get("MONEYTRACKER_SLOW_QUERY_MS", 50))
+MAX_TIMELINE_SPANS = 500     # individual spans kept per trace; totals are exact
+
+_NOT_QUERIES = ("--", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+# string/blob literals and numbers, as the trace callback expands bound values
+_LITERALS = re.compile(r"[xX]?'(?:[^']|'')*'|(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b")
+
+_local = threading.local()
+
+
+# --------------------------------------------------
+# Trace state
+# --------------------------------------------------
+class Trace:
+    """Everything recorded between start_trace() and finish_trace()."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_ms = 0.0
+        self.stack = []        # open frames: [name, kind, t0, child_ms, statements]
+        self.totals = {}       # span name -> {"kind", "calls", "total_ms", "self_ms", "queries", "rows"}
+        self.timeline = []     # (depth, name, kind, ms) in completion order
+        self.queries = 0
+        self.rows = 0
+        self.slow = []
+
+    def summary(self) -> dict:
+        """Plain-data view for the dev panel (slowest spans first)."""
+        spans = sorted(
+            ({"span": name, **stats} for name, stats in self.totals.items()),
+            key=lambda s: s["self_ms"],
+            reverse=True,
+        )
+        by_kind = {}
+        for s in spans:
+            by_kind[s["kind"]] = by_kind.get(s["kind"], 0.0) + s["self_ms"]
+
+        return {
+            "name": self.name,
+            "wall_ms": round(self.wall_ms, 2),
+            "queries": self.queries,
+            "rows": self.rows,
+            "by_kind_ms": {k: round(v, 2) for k, v in by_kind.items()},
+            "spans": [{**s, "total_ms": round(s["total_ms"], 2),
+                       "self_ms": round(s["self_ms"], 2)} for s in spans],
+            "timeline": list(self.timeline),
+            "slow_queries": list(self.slow),
+        }
+
+
+def start_trace(name: str = "rerun") -> Trace:
+    """Begin recording on this thread (replaces any unfinished trace)."""
+    trace = Trace(name)
+    _local.trace = trace
+    return trace
+
+
+def finish_trace() -> Optional[Trace]:
+    """Stop recording on this thread and return the finished trace."""
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    if trace is not None:
+        trace.wall_ms = (time.perf_counter() - trace.started) * 1000
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return getattr(_local, "trace", None)
+
+
+# --------------------------------------------------
+# Spans
+# --------------------------------------------------
+def _enter(trace: Trace, name: str, kind: str):
+    frame = [name, kind, time.perf_counter(), 0.0, []]
+    trace.stack.append(frame)
+
+    if kind == "db":
+        # Only while tracing: capture the SQL this span runs (expanded with
+        # its bound values; _log_slow strips them before anything is kept).
+        from core.database import get_connection
+        get_connection().set_trace_callback(frame[4].append)
+    return frame
+
+
+def _exit(trace: Trace, frame, rows: Optional[int]):
+    name, kind, t0, child_ms, statements = frame
+    ms = (time.perf_counter() - t0) * 1000
+
+    # generator spans may close out of order, so search by identity
+    for i in range(len(trace.stack) - 1, -1, -1):
+        if trace.stack[i] is frame:
+            del trace.stack[i]
+            break
+    parent = trace.stack[-1] if trace.stack else None
+    if parent is not None:
+        parent[3] += ms
+
+    stats = trace.totals.get(name)
+    if stats is None:
+        stats = trace.totals[name] = {"kind": kind, "calls": 0, "total_ms": 0.0,
+                                      "self_ms": 0.0, "queries": 0, "rows": 0}
+    stats["calls"] += 1
+    stats["total_ms"] += ms
+    stats["self_ms"] += ms - child_ms
+
+    if kind == "db":
+        from core.database import get_connection
+        conn = get_connection()
+        conn.set_trace_callback(parent[4].append if parent and parent[1] == "db" else None)
+
+        # BEGIN/COMMIT are not queries, and each trigger step is reported
+        # again with the text of the statement that fired it
+        sql = [s for i, s in enumerate(statements)
+               if not s.lstrip().upper().startswith(_NOT_QUERIES)
+               and (i == 0 or statements[i - 1] != s)]
+        stats["queries"] += len(sql)
+        trace.queries += len(sql)
+        if ms >= SLOW_QUERY_MS and sql:
+            _log_slow(trace, conn, name, ms, sql, rows)
+
+    if rows is not None:
+        stats["rows"] += rows
+        trace.rows += rows
+
+    if len(trace.timeline) < MAX_TIMELINE_SPANS:
+        trace.timeline.append((len(trace.stack), name, kind, round(ms, 3)))
+
+
+def _explain(conn: sqlite3.Connection, sql: str) -> list:
+    statement = sql.strip().rstrip(";")
+    if not statement.upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")):
+        return []
+    try:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+
+
+def strip_literals(sql: str) -> str:
+    """Statement text with every literal value replaced by "?"."""
+    return _LITERALS.sub("?", " ".join(sql.split()))
+
+
+def _log_slow(trace: Trace, conn, name: str, ms: float, statements, rows):
+    # the plan is taken from the expanded statement; only its shape is kept
+    entry = {
+        "span": name,
+        "ms": round(ms, 2),
+        "rows": rows,
+        "at": time.time(),
+        "statements": [
+            {"sql": strip_literals(s), "plan": _explain(conn, s)}
+            for s in statements
+        ],
+    }
+    trace.slow.append(entry)
+
+
+def _count_rows(result) -> Optional[int]:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, sqlite3.Row):
+        return 1
+    if result is None:
+        return 0
+    return None    # writes and scalars don't return rows
+
+
+class span:
+    """
+    Time a block as one span when a trace is active:
+        with span("dashboard.figures", "plotly"):
+            ...
+    """
+
+    def __init__(self, name: str, kind: str = "app"):
+        self.name = name
+        self.kind = kind
+        self._frame = None
+
+    def __enter__(self):
+        trace = current_trace()
+        if trace is not None:
+            self._frame = _enter(trace, self.name, self.kind)
+        return self
+
+    def __exit__(self, *exc):
+        trace = current_trace()
+        if trace is not None and self._frame is not None:
+            _exit(trace, self._frame, None)
+        self._frame = None
+        return False
+
+
+def traced(kind: str, name: Optional[str] = None):
+    """
+    Decorator recording each call as a span of `kind` ("db", "analytics",
+    "rates", ...). For kind="db" the SQL statements run during the call are
+    counted and slow calls get their query plans logged; rows are taken
+    from the return value (list length, 1 for a Row, 0 for None).
+    Generator functions are timed across their whole iteration; a yielded
+    list counts as a batch of rows, anything else as one row.
+    """
+
+    def decorate(fn):
+        span_name = name or f"{fn.__module__.rpartition('.')[2]}.{fn.__name__}"
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                trace = current_trace()
+                if trace is None:
+                    yield from fn(*args, **kwargs)
+                    return
+
+                frame = _enter(trace, span_name, kind)
+                rows = 0
+                try:
+                    for item in fn(*args, **kwargs):
+                        rows += len(item) if isinstance(item, list) else 1
+                        yield item
+                finally:
+                    if current_trace() is trace:
+                        _exit(trace, frame, rows)
+
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = current_trace()
+            if trace is None:
+                return fn(*args, **kwargs)
+
+            frame = _enter(trace, span_name, kind)
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            finally:
+                _exit(trace, frame, _count_rows(result))
+
+        return wrapper
+
+    return decorate
@@ -1,6 +1,7 @@
 import streamlit as st
 
-from core.auth import register_user, authenticate_user
+from core.auth import AuthRateLimited, register_user, authenticate_user
+from core.sessions import create_session
 
 
 # -----------------------------------------------------
@@ -20,16 +21,24 @@ def render():
 
         if submit:
             if st.session_state["auth_mode"] == "register":
-                ok, err = register_user(username, password)
+                ok, err = register_user(username, password, ip=st.context.ip_address)
                 if ok:
                     st.success("Account created — you may now log in.")
                     st.session_state["auth_mode"] = "login"
                 else:
                     st.error(f"Registration failed: {err}")
             else:
-                user = authenticate_user(username, password)
+                try:
+                    user = authenticate_user(username, password, ip=st.context.ip_address)
+                except AuthRateLimited as e:
+                    st.error(str(e))
+                    return
+
                 if user:
+                    token = create_session(user["id"], user["username"])
                     st.session_state["user"] = user
+                    st.session_state["session_token"] = token
+                    st.query_params["session"] = token   # survives reloads
                     st.rerun()
                 else:
                     st.error("Invalid credentials")
@@ -3,22 +3,198 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from datetime import datetime
-from core.analytics import (
-    compute_totals,
-    monthly_summary,
-    category_breakdown,
-    forecast_next_month
-)
+from datetime import date, timedelta
+from functools import partial
+from api.currency_api import RATE_TTL_SECONDS, get_rate, rate_version, rates_fetched_at
+from core.cache import LRUCache
+from core.chartdata import MAX_LABELED_POINTS, monthly_bars, net_trend, top_categories
+from core.database import get_stored_data_version
+from core.precompute import compute_dashboard, load_snapshot, store_snapshot
+from core.rate_history import history_version
+from core.tracing import span
+
+# Survives Streamlit reruns (module is imported once per process).
+# Keyed by (user, base currency, period, data version, rate and history
+# versions), so any write, rate refresh or history load naturally misses
+# and old entries age out of the LRU.
+DASHBOARD_CACHE = LRUCache(max_entries=128, max_bytes=64 * 1024 * 1024)
+
+PERIODS = ["All time", "Last 30 days", "Year to date", "Custom"]
+
+
+# -----------------------------------------
+# Period selector
+# -----------------------------------------
+def _select_period():
+    """(start, end) dates for the chosen period; None means open-ended."""
+    today = date.today()
+    period = st.selectbox("Period", PERIODS, key="dashboard_period")
+
+    if period == "Last 30 days":
+        return today - timedelta(days=29), today
+    if period == "Year to date":
+        return date(today.year, 1, 1), today
+    if period == "Custom":
+        picked = st.date_input(
+            "From / to", (today.replace(day=1), today), key="dashboard_range"
+        )
+        if len(picked) == 2:
+            return picked[0], picked[1]
+        return picked[0], picked[0]     # second date not picked yet
+    return None, None
+
+
+# -----------------------------------------
+# Figure builders
+# -----------------------------------------
+def _monthly_figure(months, incomes, expenses, base_currency):
+    df = pd.DataFrame({
+        "Month": months,
+        "Income": incomes,
+        "Expense": expenses
+    })
+
+    fig = px.bar(
+        df,
+        x="Month",
+        y=["Income", "Expense"],
+        barmode="group",
+        title=f"Monthly Income vs Expense ({base_currency})",
+        color_discrete_map={"Income": "green", "Expense": "red"},
+        text_auto=".2f" if len(months) <= MAX_LABELED_POINTS else False
+    )
+
+    fig.update_layout(
+        yaxis_title=f"Amount ({base_currency})",
+        bargap=0.25
+    )
+    return fig
+
+
+def _category_figure(breakdown, base_currency):
+    df = pd.DataFrame({
+        "Category": list(breakdown.keys()),
+        "Amount": [b["amount"] for b in breakdown.values()],
+        "Type": [b["type"] for b in breakdown.values()]
+    })
+
+    colors = ["green" if t == "Income" else "red" for t in df["Type"]]
+
+    fig2 = px.bar(
+        df,
+        x="Category",
+        y="Amount",
+        text="Amount",
+        title=f"Category Breakdown ({base_currency})",
+        text_auto=".2f"
+    )
+
+    fig2.update_traces(marker_color=colors)
+
+    fig2.update_layout(
+        yaxis_title=f"Amount ({base_currency})",
+        bargap=0.25,
+        showlegend = False
+    )
+    return fig2
+
+
+def _net_figure(months, nets, base_currency):
+    df_net = pd.DataFrame({
+        "Month": months,
+        "Net Balance": nets
+    })
+
+    fig3 = px.line(
+        df_net,
+        x="Month",
+        y="Net Balance",
+        markers=True,
+        title=f"Net Balance Trend ({base_currency})"
+    )
+
+    fig3.update_layout(
+        yaxis_title=f"Net Balance ({base_currency})",
+        bargap=0.25
+    )
+
+    if len(months) > MAX_LABELED_POINTS:
+        return fig3
+
+    # Add labels above points
+    fig3.update_traces(
+        text=df_net["Net Balance"].apply(lambda v: f"{v:.2f}"),
+        textposition="top center",
+        mode="lines+markers+text"
+    )
+    return fig3
+
+
+def _dashboard_data(base_currency, user_id, start=None, end=None) -> dict:
+    """
+    compute_dashboard() output. "All time" is served from the stored
+    snapshot (see core/precompute.py) while it is current, and stored
+    again after recomputing when it is not.
+    """
+    rate_for = partial(get_rate, base_currency)
+    if start is not None or end is not None:
+        return compute_dashboard(user_id, base_currency, rate_for, start, end)
+
+    with span("dashboard.stored_snapshot"):
+        data = load_snapshot(user_id, base_currency, RATE_TTL_SECONDS)
+    if data is not None:
+        return data
+
+    version = get_stored_data_version(user_id)
+    rates_version = history_version()
+    fetched_at = rates_fetched_at()
+    data = compute_dashboard(user_id, base_currency, rate_for)
+    store_snapshot(user_id, base_currency, version, rates_version, fetched_at, data)
+    return data
+
 
-def render(convert_to_base, base_currency, current_user):
+def _build_dashboard(base_currency, user_id, start=None, end=None) -> dict:
+    """Snapshot and forecast plus ready-made figures (None where there is no data)."""
+    data = _dashboard_data(base_currency, user_id, start, end)
+    snapshot = data["snapshot"]
+
+    view = {"snapshot": snapshot, "forecast": data["forecast"],
+            "monthly_fig": None, "category_fig": None, "net_fig": None}
+
+    # Figures get capped, bucketed series (core/chartdata.py); totals stay exact
+    with span("dashboard.build_figures", "plotly"):
+        if snapshot["monthly"]:
+            view["monthly_fig"] = _monthly_figure(*monthly_bars(snapshot["monthly"]), base_currency)
+            view["net_fig"] = _net_figure(*net_trend(snapshot["monthly"]), base_currency)
+
+        if snapshot["category"]:
+            view["category_fig"] = _category_figure(top_categories(snapshot["category"]), base_currency)
+
+    return view
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the dashboard cache, for monitoring."""
+    return DASHBOARD_CACHE.stats()
+
+
+def render(base_currency, current_user):
 
     st.header("Financial Dashboard")
 
     user_id = current_user["id"]
-
-    # All analytics now scoped by user
-    totals = compute_totals(convert_to_base, user_id=user_id)
+    start, end = _select_period()
+
+    # the stored data version also moves on writes from other processes
+    # (importer CLI, other server workers), unlike an in-process counter
+    key = (user_id, base_currency, start, end, get_stored_data_version(user_id),
+           rate_version(), history_version())
+    with span("dashboard.cache_lookup"):
+        view = DASHBOARD_CACHE.get_or_compute(
+            key, lambda: _build_dashboard(base_currency, user_id, start, end)
+        )
+    snapshot = view["snapshot"]
+    totals = snapshot["totals"]
 
     col1, col2, col3 = st.columns(3)
     col1.metric(f"Total Income ({base_currency})", totals["income"])
@@ -31,39 +207,10 @@ def render(convert_to_base, base_currency, current_user):
     # Monthly Summary
     # -----------------------------------------
     st.subheader("Monthly Income vs Expense")
-    monthly = monthly_summary(convert_to_base, user_id=user_id)
-
-    if monthly:
-        months, incomes, expenses = [], [], []
-
-        for m, vals in sorted(monthly.items()):
-            formatted = datetime.strptime(m, "%Y-%m").strftime("%b %Y")
-            months.append(formatted)
-            incomes.append(vals["income"])
-            expenses.append(vals["expense"])
-
-        df = pd.DataFrame({
-            "Month": months,
-            "Income": incomes,
-            "Expense": expenses
-        })
-
-        fig = px.bar(
-            df,
-            x="Month",
-            y=["Income", "Expense"],
-            barmode="group",
-            title=f"Monthly Income vs Expense ({base_currency})",
-            color_discrete_map={"Income": "green", "Expense": "red"},
-            text_auto = ".2f"
-        )
-
-        fig.update_layout(
-            yaxis_title=f"Amount ({base_currency})",
-            bargap=0.25
-        )
 
-        st.plotly_chart(fig, use_container_width=True)
+    if view["monthly_fig"] is not None:
+        with span("dashboard.plotly_chart", "plotly"):
+            st.plotly_chart(view["monthly_fig"], use_container_width=True)
     else:
         st.info("Not enough data for monthly summary.")
 
@@ -73,36 +220,10 @@ def render(convert_to_base, base_currency, current_user):
     # Category Breakdown
     # -----------------------------------------
     st.subheader("Spending by Category")
-    breakdown = category_breakdown(convert_to_base, user_id=user_id)
-
-    if breakdown:
-        df = pd.DataFrame({
-            "Category": list(breakdown.keys()),
-            "Amount": [b["amount"] for b in breakdown.values()],
-            "Type": [b["type"] for b in breakdown.values()]
-        })
-
-        colors = ["green" if t == "Income" else "red" for t in df["Type"]]
-
-        fig2 = px.bar(
-            df,
-            x="Category",
-            y="Amount",
-            text="Amount",
-            title=f"Category Breakdown ({base_currency})",
-            text_auto=".2f"
-        )
-
-        fig2.update_traces(marker_color=colors)
-
-        fig2.update_layout(
-            yaxis_title=f"Amount ({base_currency})",
-            bargap=0.25,
-            showlegend = False
-        )
-
 
-        st.plotly_chart(fig2, use_container_width=True)
+    if view["category_fig"] is not None:
+        with span("dashboard.plotly_chart", "plotly"):
+            st.plotly_chart(view["category_fig"], use_container_width=True)
     else:
         st.info("Not enough data for category breakdown.")
 
@@ -113,33 +234,9 @@ def render(convert_to_base, base_currency, current_user):
     # -----------------------------------------
     st.subheader("Net Balance Over Time")
 
-    if monthly:
-        df_net = pd.DataFrame({
-            "Month": months,
-            "Net Balance": [i - e for i, e in zip(incomes, expenses)]
-        })
-
-        fig3 = px.line(
-            df_net,
-            x="Month",
-            y="Net Balance",
-            markers=True,
-            title=f"Net Balance Trend ({base_currency})"
-        )
-
-        fig3.update_layout(
-            yaxis_title=f"Net Balance ({base_currency})",
-            bargap=0.25
-        )
-
-        # Add labels above points
-        fig3.update_traces(
-            text=df_net["Net Balance"].apply(lambda v: f"{v:.2f}"),
-            textposition="top center",
-            mode="lines+markers+text"
-        )
-
-        st.plotly_chart(fig3, use_container_width=True)
+    if view["net_fig"] is not None:
+        with span("dashboard.plotly_chart", "plotly"):
+            st.plotly_chart(view["net_fig"], use_container_width=True)
     else:
         st.info("Not enough data for trend chart.")
 
@@ -150,7 +247,8 @@ def render(convert_to_base, base_currency, current_user):
     # -----------------------------------------
     st.subheader("Next Month Forecast")
 
-    forecast_value = forecast_next_month(convert_to_base, user_id=user_id)
+    forecast = view["forecast"]
+    forecast_value = forecast["net"]
     delta = forecast_value - totals["net"]
 
     st.metric(
@@ -158,3 +256,12 @@ def render(convert_to_base, base_currency, current_user):
         value=f"{forecast_value:,.2f} {base_currency}",
         delta=f"{delta:,.2f} {base_currency}"
     )
+
+    if forecast["category"]:
+        with st.expander(f"Forecast by category ({forecast['month']})"):
+            st.dataframe(
+                pd.DataFrame(forecast["category"]).rename(columns={
+                    "category": "Category", "type": "Type", "amount": f"Amount ({base_currency})",
+                }),
+                hide_index=True,
+            )
@@ -0,0 +1,59 @@
+# devpanel.py
+#
+# Hidden developer panel: timing breakdown of the previous render.
+# Enabled only by MONEYTRACKER_DEV=1 in the server's environment, and only
+# rendered for logged-in sessions. Each session sees its own slow queries.
+import os
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+SLOW_LOG_SIZE = 50     # slow queries kept per session (newest last)
+
+
+def is_enabled() -> bool:
+    return os.environ.get("MONEYTRACKER_DEV") == "1"
+
+
+def record(summary):
+    """Keep a finished render's summary and its slow queries in this session."""
+    st.session_state["dev_last_trace"] = summary
+    log = st.session_state.setdefault("dev_slow_queries", [])
+    log.extend(summary["slow_queries"])
+    del log[:-SLOW_LOG_SIZE]
+
+
+def render(summary):
+    with st.sidebar.expander("Developer: last render", expanded=False):
+        if summary is None:
+            st.caption("No finished render yet — interact with the app once.")
+            return
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Wall", f"{summary['wall_ms']:.0f} ms")
+        col2.metric("Queries", summary["queries"])
+        col3.metric("Rows", summary["rows"])
+
+        st.caption("Self time by kind (ms)")
+        st.bar_chart(pd.Series(summary["by_kind_ms"], name="ms"))
+
+        st.caption("Spans (slowest self time first)")
+        st.dataframe(
+            pd.DataFrame(summary["spans"],
+                         columns=["span", "kind", "calls", "self_ms", "total_ms", "queries", "rows"]),
+            hide_index=True,
+        )
+
+        st.caption("Timeline")
+        st.text("\n".join(
+            f"{'  ' * depth}{name} [{kind}] {ms:.2f} ms"
+            for depth, name, kind, ms in summary["timeline"]
+        ) or "(empty)")
+
+        st.caption("Slow queries (this session, newest first)")
+        for entry in reversed(st.session_state.get("dev_slow_queries", [])[-20:]):
+            at = datetime.fromtimestamp(entry["at"]).strftime("%H:%M:%S")
+            st.markdown(f"**{entry['span']}** — {entry['ms']} ms, {entry['rows']} rows at {at}")
+            for stmt in entry["statements"]:
+                st.code(stmt["sql"] + "\n-- " + "\n-- ".join(stmt["plan"] or ["(no plan)"]), language="sql")
@@ -1,9 +1,20 @@
 # settings.py
 import streamlit as st
-from api.currency_api import get_rate
-from core.database import set_setting
+from api.currency_api import get_rate_info
+from core.auth import AuthRateLimited, change_password
+from core.sessions import create_session
+from core.settings import set_user_setting
+from tabs.dashboard import cache_stats as dashboard_cache_stats
 
-def render(base_currency, multi_currencies):
+def _format_age(seconds: float) -> str:
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def render(base_currency, multi_currencies, current_user):
 
     st.header("Settings")
 
@@ -16,7 +27,7 @@ def render(base_currency, multi_currencies):
     new_base = st.selectbox("Select Base Currency", multi_currencies)
 
     if st.button("Save Settings"):
-        set_setting("base_currency", new_base)
+        set_user_setting(current_user["id"], "base_currency", new_base)
         st.rerun()
 
     st.markdown("---")
@@ -31,12 +42,57 @@ def render(base_currency, multi_currencies):
     if compare == base_currency:
         st.info("Select a different currency.")
     else:
-        rate = get_rate(base_currency, compare)
+        info = get_rate_info(base_currency, compare)
         st.metric(
             label=f"1 {compare} equals",
-            value=f"{rate:.4f} {base_currency}"
+            value=f"{info['rate']:.4f} {base_currency}"
         )
 
+        if info["fetched_at"] is None:
+            st.warning("Live rate not loaded yet — showing a placeholder. It is being fetched in the background.")
+        else:
+            st.caption(f"Rate age: {_format_age(info['age_seconds'])}")
+            if info["stale"]:
+                st.warning("This rate is out of date; a refresh is in progress.")
+
+    st.markdown("---")
+
+    # ---------------------------------
+    # Password
+    # ---------------------------------
+    st.subheader("Change Password")
+
+    with st.form(key="password_form", clear_on_submit=True):
+        current = st.text_input("Current password", type="password")
+        new = st.text_input("New password", type="password")
+        repeat = st.text_input("Repeat new password", type="password")
+        submitted = st.form_submit_button("Change Password")
+
+    if submitted:
+        if new != repeat:
+            st.error("The new passwords do not match.")
+        else:
+            try:
+                ok, err = change_password(current_user["username"], current, new,
+                                          ip=st.context.ip_address)
+            except AuthRateLimited as e:
+                ok, err = False, str(e)
+
+            if ok:
+                # every session was revoked; keep this one logged in with a new token
+                token = create_session(current_user["id"], current_user["username"])
+                st.session_state["session_token"] = token
+                st.query_params["session"] = token
+                st.success("Password changed. You have been logged out on every other device.")
+            else:
+                st.error(err)
+
+    st.markdown("---")
+
+    with st.expander("Diagnostics"):
+        st.caption("Dashboard cache")
+        st.json(dashboard_cache_stats())
+
     st.markdown("---")
 
     st.subheader("About")
@@ -1,15 +1,45 @@
+import io
+import sqlite3
+import tempfile
+from functools import partial
+
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from api.currency_api import get_rate
 
-from core.models import Transaction, ValidationError
+from core.models import (
+    MAX_NOTE_LENGTH, Transaction, ValidationError, from_epoch_day, to_major,
+)
+from core.importer import import_csv, ImportFormatError
+from core.exporter import export_csv, export_parquet
+from core.settings import get_user_setting
+from core.search import suggest_categories, search_transactions
 from core.database import (
     add_transaction,
-    get_transactions_for_user,
+    get_transactions_page,
+    get_transaction_by_id,
+    count_transactions_for_user,
+    page_cursor,
     update_transaction_for_user,
     delete_transaction_for_user,
+    update_transactions_bulk,
+    delete_transactions_bulk,
 )
 
+PAGE_SIZES = [25, 50, 100]
+BULK_OPERATIONS = ["Recategorize", "Change currency", "Shift date", "Delete"]
+MAX_BULK_IDS = 100_000
+MAX_SHIFT_DAYS = 36_500     # about 100 years either way
+CATEGORY_CHOICES = 200     # matching categories offered in the category boxes
+SEARCH_LIMIT = 50
+SORT_OPTIONS = {
+    # label -> (sort key, descending)
+    "Newest first": ("date", True),
+    "Oldest first": ("date", False),
+    "ID ascending": ("id", False),
+    "ID descending": ("id", True),
+}
+
 # ------------------------------------------------------
 # FLASH MESSAGE HANDLER
 # ------------------------------------------------------
@@ -27,6 +57,255 @@ def show_message():
         del st.session_state["message"]
 
 
+# ------------------------------------------------------
+# PAGINATED LISTING (keyset pages, filtered/sorted in SQLite)
+# ------------------------------------------------------
+def render_transaction_page(user_id, multi_currencies, total):
+    c1, c2, c3, c4, c5 = st.columns(5)
+    t_type = c1.selectbox("Type", ["All", "Income", "Expense"], key="view_type")
+    currency = c2.selectbox("Currency", ["All"] + list(multi_currencies), key="view_currency")
+    category = c3.text_input("Category", key="view_category").strip()
+    sort_label = c4.selectbox("Sort", list(SORT_OPTIONS), key="view_sort")
+    page_size = c5.selectbox("Rows", PAGE_SIZES, key="view_page_size")
+
+    sort, descending = SORT_OPTIONS[sort_label]
+    query = dict(
+        sort=sort,
+        descending=descending,
+        t_type=None if t_type == "All" else t_type,
+        currency=None if currency == "All" else currency,
+        category=category or None,
+    )
+
+    # Stack of page-start cursors; reset whenever the query changes
+    signature = (tuple(sorted(query.items())), page_size)
+    if st.session_state.get("view_signature") != signature:
+        st.session_state["view_signature"] = signature
+        st.session_state["view_cursors"] = [None]
+    cursors = st.session_state["view_cursors"]
+
+    # one extra row tells us whether a next page exists
+    rows = get_transactions_page(user_id, limit=page_size + 1, after=cursors[-1], **query)
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if not rows:
+        st.info("No transactions match these filters.")
+    else:
+        df = pd.DataFrame(rows, columns=rows[0].keys())
+        df = pd.DataFrame({
+            "ID": df["id"],
+            "Type": df["t_type"],
+            "Amount": df["amount_minor"].map(to_major),
+            "Currency": df["currency"],
+            "Category": df["category"],
+            "Date": df["day"].map(from_epoch_day),
+            "Note": df["note"],
+        })
+        # Selected rows pre-fill the ID list of the bulk editor (Edit/Delete tab)
+        event = st.dataframe(df, hide_index=True, key="view_table",
+                             on_select="rerun", selection_mode="multi-row")
+        selected = df["ID"].iloc[event.selection.rows].tolist()
+        if selected and selected != st.session_state.get("view_selected"):
+            st.session_state["view_selected"] = selected
+            st.session_state["bulk_ids"] = ", ".join(str(i) for i in selected)
+
+    prev_col, info_col, next_col = st.columns([1, 4, 1])
+    info_col.caption(f"Page {len(cursors)} · {total} transaction(s) in total")
+
+    if prev_col.button("Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+
+    if next_col.button("Next", disabled=not has_next):
+        cursors.append(page_cursor(rows[-1], sort))
+        st.rerun()
+
+
+# ------------------------------------------------------
+# FULL-TEXT SEARCH (FTS5 index over category and note)
+# ------------------------------------------------------
+def render_search(user_id, text):
+    categories = suggest_categories(user_id, text)
+    if categories:
+        st.caption("Matching categories: " + " · ".join(categories))
+
+    rows = search_transactions(user_id, text, limit=SEARCH_LIMIT)
+    if not rows:
+        st.info("No transactions match this search.")
+        return
+
+    st.dataframe(pd.DataFrame({
+        "ID": [r["id"] for r in rows],
+        "Type": [r["t_type"] for r in rows],
+        "Amount": [to_major(r["amount_minor"]) for r in rows],
+        "Currency": [r["currency"] for r in rows],
+        "Category": [r["category"] for r in rows],
+        "Date": [from_epoch_day(r["day"]) for r in rows],
+        "Note": [r["note"] for r in rows],
+    }), hide_index=True)
+    if len(rows) == SEARCH_LIMIT:
+        st.caption(f"Showing the {SEARCH_LIMIT} newest matches; refine the search to narrow them down.")
+
+
+def category_filter(key):
+    """
+    Search box for the category list. Form widgets only report their value
+    on submit, so it sits above the form and narrows the list on Enter.
+    """
+    return st.text_input(
+        "Find category", key=key, placeholder="Type part of a category name",
+    )
+
+
+def category_input(user_id, current=None, prefix=""):
+    """
+    Category box offering the user's categories matching `prefix` (see
+    category_filter), most used first; typing in the box filters them
+    further and any new name can be entered too.
+    """
+    options = suggest_categories(user_id, prefix, limit=CATEGORY_CHOICES)
+    if current is not None and current not in options:
+        options = [current] + options
+    return st.selectbox(
+        "Category",
+        options,
+        index=None if current is None else options.index(current),
+        accept_new_options=True,
+        placeholder="Choose or type a category",
+    ) or ""
+
+
+# ------------------------------------------------------
+# BULK EDIT / DELETE (one batched write per submit)
+# ------------------------------------------------------
+def parse_id_list(text, limit=MAX_BULK_IDS):
+    """
+    "3, 7, 10-20" -> [3, 7, 10, ..., 20] (sorted, unique). Raises
+    ValueError for malformed input and ValidationError, before expanding
+    any range, once more than `limit` IDs are listed.
+    """
+    parts = []
+    total = 0
+    for part in text.replace(";", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        lo = int(first)
+        hi = int(last) if sep else lo
+        if hi < lo:
+            raise ValueError(f"Empty range: {part}")
+        total += hi - lo + 1
+        if total > limit:
+            raise ValidationError(f"Give at most {limit:,} transaction IDs.")
+        parts.append((lo, hi))
+
+    ids = set()
+    for lo, hi in parts:
+        ids.update(range(lo, hi + 1))
+    return sorted(ids)
+
+
+def render_bulk_edit(user_id, multi_currencies):
+    with st.form(key="bulk_form"):
+        ids_text = st.text_input(
+            "Transaction IDs", key="bulk_ids",
+            help="Comma-separated IDs and ranges, e.g. 12, 40-75. "
+                 "Rows selected in the View Transactions tab are filled in.",
+        )
+        operation = st.radio("Operation", BULK_OPERATIONS, horizontal=True)
+
+        c1, c2, c3 = st.columns(3)
+        new_category = c1.text_input("New category")
+        new_currency = c2.selectbox("New currency", multi_currencies)
+        shift_days = int(c3.number_input("Shift by days", step=1, value=0,
+                                         min_value=-MAX_SHIFT_DAYS, max_value=MAX_SHIFT_DAYS))
+        confirm = st.checkbox("Yes, delete these transactions")
+
+        if not st.form_submit_button("Apply to all listed"):
+            return
+
+    try:
+        row_ids = parse_id_list(ids_text)
+    except ValidationError as e:
+        st.session_state["message"] = ("error", str(e))
+        st.rerun()
+    except ValueError:
+        st.session_state["message"] = ("error", "IDs must be numbers or ranges like 10-20.")
+        st.rerun()
+
+    if not row_ids:
+        st.session_state["message"] = ("error", "Give at least one transaction ID.")
+        st.rerun()
+
+    try:
+        if operation == "Recategorize":
+            Transaction.validate_category(new_category)
+            changed = update_transactions_bulk(user_id, row_ids, category=new_category.strip())
+        elif operation == "Change currency":
+            changed = update_transactions_bulk(user_id, row_ids, currency=new_currency)
+        elif operation == "Shift date":
+            changed = update_transactions_bulk(user_id, row_ids, shift_days=shift_days)
+        elif confirm:
+            changed = delete_transactions_bulk(user_id, row_ids)
+        else:
+            raise ValidationError("Tick the confirmation box to delete.")
+    except ValidationError as e:
+        st.session_state["message"] = ("error", str(e))
+    except sqlite3.Error as e:
+        st.session_state["message"] = ("error", f"Nothing was changed: {e}")
+    else:
+        verb = "deleted" if operation == "Delete" else "updated"
+        st.session_state["message"] = (
+            "success", f"{changed} of {len(row_ids)} transaction(s) {verb}."
+        )
+        st.session_state.pop("view_selected", None)
+
+    st.rerun()
+
+
+# ------------------------------------------------------
+# EXPORT (streamed to a temp file, never a full in-memory result set)
+# ------------------------------------------------------
+def _export_bytes(user_id, fmt, base, rate_for) -> bytes:
+    """Stream the export into a temp file and return the finished file."""
+    with tempfile.TemporaryFile() as tmp:
+        if fmt == "CSV":
+            text = io.TextIOWrapper(tmp, encoding="utf-8", newline="")
+            export_csv(user_id, text, base, rate_for)
+            text.flush()
+            text.detach()
+        else:
+            export_parquet(user_id, tmp, base, rate_for)
+
+        tmp.seek(0)
+        return tmp.read()
+
+
+def render_export(user_id):
+    st.markdown("#### Export")
+
+    col1, col2 = st.columns(2)
+    fmt = col1.radio("Format", ["CSV", "Parquet"], horizontal=True, key="export_format")
+    with_base = col2.checkbox("Add amounts in base currency", key="export_base")
+
+    base = get_user_setting(user_id, "base_currency") if with_base else None
+    rate_for = partial(get_rate, base) if with_base else None
+    if fmt == "CSV":
+        file_name, mime = "transactions.csv", "text/csv"
+    else:
+        file_name, mime = "transactions.parquet", "application/octet-stream"
+
+    # Deferred: the export only runs when the button is clicked, not on
+    # every rerun. Streamlit still keeps the finished file in memory to
+    # serve it, so a download costs the file size once (never the rows).
+    st.download_button(
+        "Download", partial(_export_bytes, user_id, fmt, base, rate_for),
+        file_name=file_name, mime=mime, on_click="ignore"
+    )
+
+
 # ------------------------------------------------------
 # MAIN RENDER FUNCTION
 # ------------------------------------------------------
@@ -43,10 +322,37 @@ def render(multi_currencies, current_user):
     # Show all flash messages
     show_message()
 
-    tabA, tabB, tabC = st.tabs(
-        ["Add Transaction", "View Transactions", "Edit/Delete"]
+    tabA, tabB, tabC, tabD = st.tabs(
+        ["Add Transaction", "View Transactions", "Edit/Delete", "Import CSV"]
     )
 
+    # ======================================================
+    # BULK IMPORT (rendered first: the Edit/Delete tab may return early)
+    # ======================================================
+    with tabD:
+        st.subheader("Import Transactions from CSV")
+        st.caption("Columns: t_type (Income/Expense), amount, currency, category, "
+                   "date (YYYY-MM-DD), optional note")
+
+        upload = st.file_uploader("CSV file", type=["csv"])
+
+        if upload is not None and st.button("Import"):
+            try:
+                with st.spinner("Importing..."):
+                    report = import_csv(upload, user_id)
+            except ImportFormatError as e:
+                st.error(f"Import failed: {e}")
+            else:
+                st.success(
+                    f"Imported {report.imported} row(s) in {report.seconds:.1f}s; "
+                    f"rejected {report.rejected}."
+                )
+                if report.errors:
+                    st.dataframe(
+                        pd.DataFrame(report.errors, columns=["Line", "Error"]),
+                        hide_index=True,
+                    )
+
     # ======================================================
     # ADD TRANSACTION
     # ======================================================
@@ -55,13 +361,15 @@ def render(multi_currencies, current_user):
 
         # unique key for form reset
         form_key = f"add_form_reset_{st.session_state.get('form_reset', 0)}"
+        prefix = category_filter("add_category_prefix")
 
         with st.form(key=form_key):
             t_type = st.selectbox("Type", ["Income", "Expense"])
             amount = st.number_input("Amount", min_value=0.0, step=0.5)
             currency = st.selectbox("Currency", multi_currencies)
-            category = st.text_input("Category")
+            category = category_input(user_id, prefix=prefix)
             date = st.date_input("Date")
+            note = st.text_input("Note (optional)", max_chars=MAX_NOTE_LENGTH)
 
             submitted = st.form_submit_button("Add Transaction")
 
@@ -73,6 +381,7 @@ def render(multi_currencies, current_user):
                         currency=currency,
                         category=category,
                         date_input=str(date),
+                        note=note,
                     )
                     add_transaction(tx, user_id)
                     st.session_state["message"] = ("success", "Transaction added.")
@@ -91,14 +400,19 @@ def render(multi_currencies, current_user):
     with tabB:
         st.subheader("All Transactions")
 
-        rows = get_transactions_for_user(user_id)
+        total = count_transactions_for_user(user_id)
 
-        if not rows:
+        if not total:
             st.info("No transactions yet.")
         else:
-            df = pd.DataFrame(rows)
-            df.columns = ["ID", "Type", "Amount", "Currency", "Category", "Date", "User"]
-            st.dataframe(df.drop(columns=["User"]), hide_index=True)
+            search = st.text_input(
+                "Search", key="view_search", placeholder="Search categories and notes",
+            ).strip()
+            if search:
+                render_search(user_id, search)
+            else:
+                render_transaction_page(user_id, multi_currencies, total)
+            render_export(user_id)
 
     # ======================================================
     # EDIT / DELETE TRANSACTIONS
@@ -106,20 +420,30 @@ def render(multi_currencies, current_user):
     with tabC:
         st.subheader("Edit or Delete Transactions")
 
-        rows = get_transactions_for_user(user_id)
+        latest = get_transactions_page(user_id, limit=1, sort="date", descending=True)
 
-        if not rows:
+        if not latest:
             st.info("No transactions to modify.")
             return
 
-        row_ids = [r["id"] for r in rows]
-        selected_id = st.selectbox("Transaction ID", row_ids)
-        selected = next(r for r in rows if r["id"] == selected_id)
+        with st.expander("Bulk edit or delete"):
+            render_bulk_edit(user_id, multi_currencies)
+
+        selected_id = int(st.number_input(
+            "Transaction ID", min_value=1, step=1, value=latest[0]["id"],
+            help="IDs are shown in the View Transactions tab. Defaults to the most recent one.",
+        ))
+        selected = get_transaction_by_id(selected_id, user_id)
+
+        if selected is None:
+            st.warning(f"No transaction with ID {selected_id}.")
+            return
 
         # -----------------------------
         # EDIT TRANSACTION
         # -----------------------------
         st.markdown("### Edit Transaction")
+        prefix = category_filter("edit_category_prefix")
 
         with st.form(key="edit_form"):
             new_type = st.selectbox(
@@ -132,7 +456,7 @@ def render(multi_currencies, current_user):
                 "Amount",
                 min_value=0.0,
                 step=0.5,
-                value=float(selected["amount"]),
+                value=to_major(selected["amount_minor"]),
             )
 
             new_currency = st.selectbox(
@@ -141,10 +465,12 @@ def render(multi_currencies, current_user):
                 index=multi_currencies.index(selected["currency"]),
             )
 
-            new_category = st.text_input("Category", selected["category"])
+            new_category = category_input(user_id, selected["category"], prefix)
+
+            new_date = st.date_input("Date", from_epoch_day(selected["day"]))
 
-            new_date = st.date_input(
-                "Date", datetime.strptime(selected["date"], "%Y-%m-%d")
+            new_note = st.text_input(
+                "Note (optional)", selected["note"], max_chars=MAX_NOTE_LENGTH
             )
 
             edit_ok = st.form_submit_button("Save Changes")
@@ -157,6 +483,7 @@ def render(multi_currencies, current_user):
                         currency=new_currency,
                         category=new_category,
                         date_input=str(new_date),
+                        note=new_note,
                     )
 
                     ok = update_transaction_for_user(